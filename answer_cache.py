@@ -0,0 +1,116 @@
+import os
+import re
+import time
+import threading
+from difflib import SequenceMatcher
+from collections import OrderedDict
+
+# Answer cache settings: entries kept per course, seconds an answer stays fresh, and the share of
+# the words (in order) needed to reuse the answer of a differently worded question. Fuzzy matching
+# is off by default (0): only questions with the same normalized wording share an answer.
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 256))
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 3600))
+ANSWER_CACHE_SIMILARITY = float(os.environ.get("ANSWER_CACHE_SIMILARITY", 0))
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Filler words a fuzzy match may add, drop or change ("what is the mean" ~ "what is mean please");
+# every other word (content words, negations, question words, numbers) must match exactly, in order
+STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "do", "does", "did", "can", "could", "would",
+    "will", "please", "i", "me", "my", "we", "you", "of", "in", "on", "for", "to", "about", "and",
+    "or", "so", "just", "really", "exactly", "again", "thanks", "hi", "hello",
+}
+
+# Words and phrases that refer back to earlier turns ("What does that mean?", "the previous one")
+BACK_REFERENCE_PATTERN = re.compile(
+    r"\b(that|this|it|its|it's|those|these|they|them|their|previous|above|earlier|again|same|"
+    r"last one|you said|you mentioned|go on|continue|more detail)\b"
+)
+
+# Normalize a question so trivially different wordings share a key ("What is a p-value?" ->
+# "what is a p value"); word order, negations and question words are kept
+def normalize_question(question):
+    return " ".join(WORD_PATTERN.findall(question.lower()))
+
+# Function to tell whether a question refers back to the conversation, so its answer depends on it
+def refers_to_history(question):
+    return bool(BACK_REFERENCE_PATTERN.search(question.lower()))
+
+def _content_words(words):
+    return [word for word in words if word not in STOP_WORDS]
+
+# Function to compare two normalized questions: the share of their words that match in order,
+# or 0 if they differ in any word that is not filler (so "median" never matches "mean")
+def question_similarity(a, b):
+    if _content_words(a) != _content_words(b):
+        return 0.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+class AnswerCache:
+    """
+    Per-course LRU cache of tutor answers with a TTL. Entries are tied to the course's
+    trained_at timestamp, so retraining a course (read_docs.py) invalidates its answers.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE, ttl=ANSWER_CACHE_TTL, similarity=ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.lock = threading.Lock()
+        self.courses = {}  # course_id -> (trained_at, OrderedDict of key -> (stored_at, words, answer))
+
+    def _entries(self, course_id, trained_at):
+        cached = self.courses.get(course_id)
+        if cached is None or cached[0] != trained_at:
+            cached = (trained_at, OrderedDict())
+            self.courses[course_id] = cached
+        return cached[1]
+
+    def get(self, course_id, trained_at, question):
+        key = normalize_question(question)
+        if not key:
+            return None
+        now = time.monotonic()
+        with self.lock:
+            entries = self._entries(course_id, trained_at)
+            entry = entries.get(key)
+            if entry and now - entry[0] <= self.ttl:
+                entries.move_to_end(key)
+                return entry[2]
+
+            if not self.similarity:
+                return None
+            words = key.split()
+            best_key, best_score = None, self.similarity
+            for other_key, (stored_at, other_words, _) in entries.items():
+                if now - stored_at > self.ttl:
+                    continue
+                score = question_similarity(words, other_words)
+                if score >= best_score:
+                    best_key, best_score = other_key, score
+            if best_key is None:
+                return None
+            entries.move_to_end(best_key)
+            return entries[best_key][2]
+
+    def put(self, course_id, trained_at, question, answer):
+        key = normalize_question(question)
+        if not key:
+            return
+        with self.lock:
+            entries = self._entries(course_id, trained_at)
+            entries[key] = (time.monotonic(), key.split(), answer)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def invalidate(self, course_id):
+        with self.lock:
+            self.courses.pop(course_id, None)
+
+
+# Shared cache for this process
+answer_cache = AnswerCache()
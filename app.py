@@ -1,11 +1,23 @@
 import os
-from flask import Flask, request, jsonify, render_template, send_from_directory, session
-from google.cloud import storage
+import posixpath
+from flask import Flask, Response, request, jsonify, render_template, session, stream_with_context
 from werkzeug.utils import secure_filename
-import subprocess
 import json
-from take_prompts import generate_gpt_response, save_context
 import psycopg2
+import time
+from take_prompts import generate_gpt_response, generate_gpt_response_stream
+from rate_limit import RateLimited
+from identity_cache import (identity_cache, get_student_id, get_proctor_course_id, invalidate_student, invalidate_proctor,
+                            get_student_courses as cached_student_courses, get_proctor_courses as cached_proctor_courses)
+from model_router import validate_course_settings, DEFAULT_MODEL, FAST_MODEL, DEFAULT_TEMPERATURE, DEFAULT_MAX_TOKENS
+from answer_cache import answer_cache
+from roster import RosterError, parse_roster_csv, parse_roster_json, enroll_students
+from db import get_db_connection
+from jobs import enqueue_training_job, get_training_job
+from uploads import create_upload_session, get_upload_session, delete_upload_session
+from storage_backend import get_storage
+from metrics import span, observe, render_prometheus, METRICS_ENABLED
+from documents import ALLOWED_EXTENSIONS, record_document, remove_document, list_documents, manifest_state, sync_documents
 from dotenv import load_dotenv
 
 app = Flask(__name__, static_folder='static', template_folder='templates')
@@ -15,28 +27,43 @@ app.secret_key = os.urandom(24) #random session ID
 # Load environment variables
 load_dotenv()
 
-DB_HOST = os.environ.get("DB_HOST")
-DB_NAME = os.environ.get("DB_NAME")
-DB_USER = os.environ.get("DB_USER")
-DB_PASS = os.environ.get("DB_PASS")
+# Per-request timing, exposed at /metrics
+@app.before_request
+def start_request_timer():
+    request.started_at = time.perf_counter()
 
-os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = "/workspace/gcloud_keys/ds400-capstone-7c0083efd90a.json"
+@app.after_request
+def record_request_time(response):
+    started_at = getattr(request, 'started_at', None)
+    if started_at is not None and request.endpoint != 'metrics':
+        observe("tutor_request_seconds", time.perf_counter() - started_at, help="HTTP request duration",
+                endpoint=request.endpoint or "unknown", method=request.method, status=response.status_code)
+    return response
 
-bucket_name = "ai-tutor-docs" 
+@app.route('/metrics')
+def metrics():
+    if not METRICS_ENABLED:
+        return jsonify(success=False, message="Metrics are disabled"), 404
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
 
-# Initialize Google Cloud Storage client
-storage_client = storage.Client()
-bucket = storage_client.bucket(bucket_name)
+# Documents are kept in the storage backend from storage_backend.py (GCS by default, created on first use)
 
 # Ensure the "admin" folder exists in the bucket
 def ensure_user_folder_exists():
-    blob = bucket.blob(session.get('folder_prefix')+'/')
-    if not blob.exists():
-        blob.upload_from_string("", content_type="application/x-www-form-urlencoded")
+    folder = session.get('folder_prefix')+'/'
+    if not get_storage().exists(folder):
+        get_storage().put(folder, "", content_type="application/x-www-form-urlencoded")
 
-# Check if a file has an allowed extension
-ALLOWED_EXTENSIONS = {'pdf', 'pptx'}
+# Upload/download chunk sizes (resumable upload chunks must be a multiple of 256 KiB)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+MIME_TYPES = {
+    'pdf': 'application/pdf',
+    'pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
 
+# Check if a file has an allowed extension
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -52,6 +79,15 @@ def student():
 def proctor():
     return render_template('proctor.html')
 
+# Function to build the name of an object inside the logged-in proctor's folder from path parts;
+# None when no proctor is logged in or the name would leave their folder (e.g. "../other_2/x.pdf")
+def proctor_object_name(*parts):
+    folder_prefix = session.get('folder_prefix')
+    if not folder_prefix:
+        return None
+    name = posixpath.normpath("/".join([folder_prefix] + [part.strip("/") for part in parts]))
+    return name if name.startswith(folder_prefix + "/") else None
+
 # Upload file endpoint
 @app.route('/upload', methods=['POST'])
 def upload_file():
@@ -67,50 +103,162 @@ def upload_file():
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
         # Construct the file path with course included
-        file_path = f"{session.get('folder_prefix')}/{course}/{filename}"
-        blob = bucket.blob(file_path)
-        blob.upload_from_file(file)
+        file_path = proctor_object_name(course, filename)
+        if file_path is None:
+            return jsonify(success=False, message="Invalid course"), 403
+        with span("storage.put"):
+            stored = get_storage().put(file_path, file, content_type=MIME_TYPES[filename.rsplit('.', 1)[1].lower()],
+                                       chunk_size=UPLOAD_CHUNK_SIZE)  # streamed chunk by chunk
+        record_document(session.get('folder_prefix'), file_path, stored.size, stored.generation)
         return jsonify(success=True, message="File uploaded")
     
     return jsonify(success=False, message="Invalid file")
 
 @app.route('/load-docs', methods=['GET'])
 def load_docs():
-    # Initialize the storage client 
-    storage_client = storage.Client()
-    bucket_name = "ai-tutor-docs"
-    bucket = storage_client.bucket(bucket_name)
-
     # Get the folder prefix for the current session
     folder_prefix = session.get('folder_prefix')
     if not folder_prefix:
         return jsonify({'error': 'Folder prefix not found in session'}), 400
 
-    # List blobs in the bucket with the specified prefix
-    blobs = bucket.list_blobs(prefix=folder_prefix)
-    
-    # Filter out directories and invalid file types
-    valid_extensions = ['pdf', 'pptx']
-    file_list = [
-        {
-            'name': blob.name.replace(folder_prefix, ''),  # Remove prefix from file name
-            'type': 'pdf' if blob.name.endswith('.pdf') else 'pptx'
-        }
-        for blob in blobs
-        if not blob.name.endswith('/') and blob.name.split('.')[-1] in valid_extensions
-    ]
-
-    return jsonify(file_list)
-
-@app.route('/docs/<filename>')
+    # Optional pagination (?limit=&offset=); the total is returned in the X-Total-Count header
+    limit = request.args.get('limit', type=int)
+    offset = request.args.get('offset', default=0, type=int)
+
+    etag, total, synced = manifest_state(folder_prefix)
+
+    # A folder is read from the bucket once (for files uploaded before the manifest existed), then
+    # only on ?refresh=1; an empty folder that has been synced is answered from the manifest
+    if request.args.get('refresh') == '1' or not synced:
+        with span("storage.list"):
+            blobs = get_storage().list(folder_prefix + "/")  # the slash keeps "bob_1" from matching "bob_1_2/"
+        sync_documents(folder_prefix, blobs)
+        etag, total, synced = manifest_state(folder_prefix)
+
+    if request.if_none_match.contains(etag):
+        return '', 304, {'ETag': f'"{etag}"'}
+
+    file_list = list_documents(folder_prefix, limit, offset)
+    response = jsonify(file_list)
+    response.set_etag(etag)
+    response.headers['X-Total-Count'] = str(total)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Start a resumable upload for a large file; the browser then sends it in chunks to /upload/<upload_id>
+@app.route('/upload/start', methods=['POST'])
+def start_upload():
+    proctor_id = session.get('id')
+    if not proctor_id:
+        return jsonify(success=False, message="Unauthorized"), 401
+
+    data = request.get_json()
+    course = data.get('course')
+    filename = data.get('filename')
+    size = data.get('size')
+    if not course:
+        return jsonify(success=False, message="No course specified"), 400
+    if not filename or not allowed_file(filename) or not isinstance(size, int) or size <= 0:
+        return jsonify(success=False, message="Invalid file"), 400
+
+    file_path = proctor_object_name(course, secure_filename(filename))
+    if file_path is None:
+        return jsonify(success=False, message="Invalid course"), 403
+    token = get_storage().start_upload(file_path, size, content_type=MIME_TYPES[filename.rsplit('.', 1)[1].lower()])
+
+    # The storage session (a GCS session URL) stays on the server; the browser only gets the upload ID
+    upload_id = create_upload_session(proctor_id, session.get('folder_prefix'), file_path, size, token)
+    return jsonify(success=True, upload_id=upload_id, chunk_size=UPLOAD_CHUNK_SIZE, offset=0)
+
+# Finish a resumable upload once the storage backend reports the file as stored
+def complete_upload(upload_id, upload, stored):
+    record_document(upload['folder_prefix'], upload['blob_name'], upload['size'], stored.generation)
+    delete_upload_session(upload_id)
+    return jsonify(success=True, done=True, offset=upload['size'], message="File uploaded")
+
+# Send one chunk (PUT) or ask how much has been stored so far (GET, used to resume after a failure)
+@app.route('/upload/<upload_id>', methods=['GET', 'PUT'])
+def upload_chunk(upload_id):
+    proctor_id = session.get('id')
+    if not proctor_id:
+        return jsonify(success=False, message="Unauthorized"), 401
+    upload = get_upload_session(upload_id, proctor_id)
+    if not upload:
+        return jsonify(success=False, message="Upload not found"), 404
+
+    try:
+        if request.method == 'GET':
+            offset, stored = get_storage().upload_chunk(upload['token'], upload['size'])
+        else:
+            offset = request.args.get('offset', type=int)
+            length = request.content_length
+            if offset is None or not length:
+                return jsonify(success=False, message="Chunk offset and length are required"), 400
+            # The request body is streamed straight through to storage, so memory use stays at one buffer
+            offset, stored = get_storage().upload_chunk(upload['token'], upload['size'], offset, request.stream, length)
+    except IOError as e:
+        return jsonify(success=False, message=str(e)), 502
+
+    if stored is not None:
+        return complete_upload(upload_id, upload, stored)
+    return jsonify(success=True, done=False, offset=offset)
+
+# Stream a byte range of a stored file without loading the whole file into memory
+def stream_blob(blob, start, length):
+    with get_storage().open(blob.name, chunk_size=DOWNLOAD_CHUNK_SIZE) as reader:
+        reader.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = reader.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+@app.route('/docs/<path:filename>')
 def get_doc(filename):
-    # Serve file from bucket
-    blob = bucket.blob(f"{session.get('folder_prefix')}{filename}")
-    if blob.exists():
-        file_data = blob.download_as_bytes()
-        response = send_from_directory(file_data, mimetype='application/pdf' if filename.endswith('.pdf') else 'application/vnd.openxmlformats-officedocument.presentationml.presentation')
-        return response
-    return jsonify(success=False, message="File not found"), 404
+    if not session.get('folder_prefix'):
+        return jsonify(success=False, message="Unauthorized"), 401
+
+    # Serve file from bucket, streamed, with Range and conditional GET support so viewers can fetch pages lazily
+    name = proctor_object_name(filename)
+    blob = get_storage().stat(name) if name else None  # names outside the proctor's folder are never looked up
+    if blob is None:
+        return jsonify(success=False, message="File not found"), 404
+
+    etag = blob.etag
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'private, no-cache',
+    }
+    if blob.updated:
+        headers['Last-Modified'] = blob.updated.strftime('%a, %d %b %Y %H:%M:%S GMT')
+
+    if request.if_none_match.contains(etag) or (
+        not request.if_none_match and request.if_modified_since and blob.updated
+        and blob.updated.replace(microsecond=0) <= request.if_modified_since
+    ):
+        return Response(status=304, headers=headers)
+
+    mimetype = MIME_TYPES.get(filename.rsplit('.', 1)[-1].lower(), 'application/octet-stream')
+    size = blob.size
+    byte_range = request.range
+    # If-Range: only honour the range if the client's copy is still current
+    if byte_range and request.if_range and request.if_range.etag and request.if_range.etag != etag:
+        byte_range = None
+
+    if byte_range:
+        content_range = byte_range.make_content_range(size)
+        if content_range is None:
+            return Response(status=416, headers={**headers, 'Content-Range': f'bytes */{size}'})
+        start, stop = content_range.start, content_range.stop
+        headers['Content-Range'] = content_range.to_header()
+        headers['Content-Length'] = str(stop - start)
+        return Response(stream_blob(blob, start, stop - start), status=206, mimetype=mimetype, headers=headers)
+
+    headers['Content-Length'] = str(size)
+    return Response(stream_blob(blob, 0, size), status=200, mimetype=mimetype, headers=headers)
 
 # Delete file endpoint
 @app.route('/delete', methods=['DELETE'])
@@ -124,16 +272,17 @@ def delete_file():
         return jsonify(success=False, message="No course specified")
 
     # Construct the file path with course included
-    file_path = f"{session.get('folder_prefix')}{file_name}" #through testing, folder_prefix already had username/coursename/ 
-    blob = bucket.blob(file_path)
-
-    if blob.exists():
-        blob.delete()
+    file_path = proctor_object_name(file_name)  # file_name is relative to the folder, e.g. "/course/notes.pdf"
+    if file_path is None:
+        return jsonify(success=False, message="File not found"), 404
+    if get_storage().exists(file_path):
+        get_storage().delete(file_path)
+        remove_document(file_path)
         return jsonify(success=True, message="File deleted")
     
     return jsonify(success=False, message="File not found at "+file_path)
 
-# Train model endpoint
+# Train model endpoint (queues a background job and returns its ID right away)
 @app.route("/train", methods=["POST"])
 def train_model():
     try:
@@ -148,19 +297,32 @@ def train_model():
         if not course_name:
             return jsonify({"success": False, "message": "Course name is required"}), 400
 
-        # Run the training script with username, course_name, and proctor_id
-        subprocess.run(['python', 'train/read_docs.py', username, course_name, str(proctor_id)], check=True)
+        # The worker runs train/read_docs.py's train_course with username, course_name, and proctor_id
+        job_id = enqueue_training_job(username, course_name, proctor_id)
 
-        return jsonify({"success": True, "message": f"Training completed successfully for course {course_name}!"}), 200
-    except subprocess.CalledProcessError as e:
-        return jsonify({"success": False, "message": f"Training script error: {str(e)}"}), 500
+        return jsonify({"success": True, "job_id": job_id, "message": f"Training queued for course {course_name}."}), 202
     except Exception as e:
         return jsonify({"success": False, "message": f"Error occurred: {str(e)}"}), 500
 
+# Training progress endpoint
+@app.route("/train-status/<int:job_id>", methods=["GET"])
+def train_status(job_id):
+    proctor_id = session.get("id")
+    if not proctor_id:
+        return jsonify({"success": False, "message": "Unauthorized"}), 401
+    try:
+        job = get_training_job(job_id, proctor_id)
+        if not job:
+            return jsonify({"success": False, "message": "Job not found"}), 404
+        return jsonify({"success": True, "job": job}), 200
+    except Exception as e:
+        return jsonify({"success": False, "message": str(e)}), 500
+
 @app.route('/assign-student', methods=['POST'])
 def assign_student():
     """
-    Assign a student to a course and update the `learned_context` for all entries in that course.
+    Assign a student to a course. The course context lives once on Courses, so enrolling
+    only adds a Student_Courses row for the student's own state.
     """
     try:
         data = request.get_json()
@@ -171,49 +333,73 @@ def assign_student():
         if not (student_username and course_name and proctor_id):
             return jsonify({'success': False, 'message': 'Missing required parameters.'}), 400
 
-        # Fetch the student ID
-        student_query = "SELECT id FROM Students WHERE username = %s"
-        course_query = "SELECT id FROM Courses WHERE name = %s AND proctor_id = %s"
+        # Resolve the student and the proctor's course (usually from the identity cache)
+        student_id = get_student_id(student_username)
+        if not student_id:
+            return jsonify({'success': False, 'message': 'Student not found.'}), 404
+        course_id = get_proctor_course_id(proctor_id, course_name)
+        if not course_id:
+            return jsonify({'success': False, 'message': 'Course not found.'}), 404
 
         with get_db_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(student_query, (student_username,))
-                student_row = cursor.fetchone()
-                if not student_row:
-                    return jsonify({'success': False, 'message': 'Student not found.'}), 404
-                student_id = student_row[0]
-
-                cursor.execute(course_query, (course_name, proctor_id))
-                course_row = cursor.fetchone()
-                if not course_row:
-                    return jsonify({'success': False, 'message': 'Course not found.'}), 404
-                course_id = course_row[0]
-
-                # Fetch the current context for the course
-                context_query = "SELECT context FROM Courses WHERE id = %s"
-                cursor.execute(context_query, (course_id,))
-                context_row = cursor.fetchone()
-                learned_context = context_row[0] if context_row else ""
-
                 # Insert into Student_Courses table
                 insert_query = """
-                INSERT INTO Student_Courses (student_id, course_id, learned_context)
-                VALUES (%s, %s, %s)
+                INSERT INTO Student_Courses (student_id, course_id)
+                VALUES (%s, %s)
+                ON CONFLICT (student_id, course_id) DO NOTHING
                 """
-                cursor.execute(insert_query, (student_id, course_id, learned_context))
-
-                # Update learned_context for all course entries
-                update_query = """
-                UPDATE Student_Courses SET learned_context = %s WHERE course_id = %s
-                """
-                cursor.execute(update_query, (learned_context, course_id))
+                cursor.execute(insert_query, (student_id, course_id))
 
             conn.commit()  # Ensure changes are committed
+        invalidate_student(student_id)
 
         return jsonify({'success': True, 'message': 'Student assigned successfully.'}), 200
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# Enroll a whole roster at once: a CSV/JSON file upload (form fields "file" and "course_name")
+# or a JSON body {"course_name": ..., "usernames": [...]}
+@app.route('/assign-students', methods=['POST'])
+def assign_students():
+    proctor_id = session.get('id')
+    if not proctor_id or not session.get('folder_prefix'):  # only proctors have a folder
+        return jsonify({'success': False, 'message': 'Unauthorized'}), 401
+
+    try:
+        if 'file' in request.files:
+            course_name = request.form.get('course_name')
+            roster_file = request.files['file']
+            data = roster_file.read()
+            if roster_file.filename.lower().endswith('.json'):
+                usernames = parse_roster_json(data)
+            else:
+                usernames = parse_roster_csv(data)
+        else:
+            data = request.get_json(silent=True) or {}
+            course_name = data.get('course_name')
+            usernames = parse_roster_json(data)
+
+        if not course_name:
+            return jsonify({'success': False, 'message': 'Missing required parameters.'}), 400
+
+        results = enroll_students(proctor_id, course_name, usernames)
+    except RosterError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return jsonify({
+        'success': True,
+        'enrolled': counts.get('enrolled', 0),
+        'already_enrolled': counts.get('already_enrolled', 0),
+        'failed': [result for result in results if result['status'] not in ('enrolled', 'already_enrolled')],
+        'results': results,
+    }), 200
+
 
 # Student-specific API for asking questions
 @app.route('/ask-question', methods=['POST'])
@@ -228,30 +414,58 @@ def ask_question():
             return jsonify({'success': False, 'message': 'Missing required parameters.'}), 400
 
         # Call the generate_gpt_response function
-        tutor_response = generate_gpt_response(student_id, course_name, question)
+        tutor_response, citations = generate_gpt_response(student_id, course_name, question)
         
-        return jsonify({'success': True, 'response': tutor_response}), 200
+        return jsonify({'success': True, 'response': tutor_response, 'citations': citations}), 200
+    except RateLimited as e:
+        return jsonify({'success': False, 'message': str(e)}), 429, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
+# Format one Server-Sent Events message
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+# Streaming variant of /ask-question: forwards the answer as Server-Sent Events while it is generated
+@app.route('/ask-question-stream', methods=['POST'])
+def ask_question_stream():
+    data = request.get_json()
+    student_id = session.get('id')
+    course_name = data.get('courseName')
+    question = data.get('question')
+
+    if not (student_id and course_name and question):
+        return jsonify({'success': False, 'message': 'Missing required parameters.'}), 400
+
+    def events():
+        citations = []
+        try:
+            for delta in generate_gpt_response_stream(student_id, course_name, question, citations):
+                yield sse_event({'delta': delta})
+            yield sse_event({'success': True, 'citations': citations}, event='done')
+        except RateLimited as e:
+            yield sse_event({'success': False, 'message': str(e), 'retry_after': e.retry_after}, event='error')
+        except Exception as e:
+            yield sse_event({'success': False, 'message': str(e)}, event='error')
+
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/get-courses', methods=['GET'])
 def get_courses():
     proctor_id = session.get("id")
     if not proctor_id:
         return jsonify(success=False, message="Unauthorized"), 401
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        cursor.execute("SELECT id, name FROM Courses WHERE proctor_id = %s", (proctor_id,))
-        courses = cursor.fetchall()
         # Return a list of courses as JSON
-        return jsonify(success=True, courses=[{"id": row[0], "name": row[1]} for row in courses])
+        return jsonify(success=True, courses=cached_proctor_courses(proctor_id))
     except Exception as e:
         return jsonify(success=False, message=str(e)), 500
-    finally:
-        cursor.close()
-        conn.close()
         
 @app.route('/get-student-courses', methods=['GET'])
 def get_student_courses():
@@ -261,17 +475,7 @@ def get_student_courses():
         if not student_id:
             return jsonify({'success': False, 'message': 'Student not logged in.'}), 403
 
-        query = """
-        SELECT c.id, c.name
-        FROM Courses c
-        INNER JOIN Student_Courses sc ON c.id = sc.course_id
-        WHERE sc.student_id = %s
-        """
-        with get_db_connection().cursor() as cursor:
-            cursor.execute(query, (student_id,))
-            courses = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
-
-        return jsonify({'success': True, 'courses': courses}), 200
+        return jsonify({'success': True, 'courses': cached_student_courses(student_id)}), 200
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -290,45 +494,79 @@ def add_course():
     if not course_name:
         return jsonify(success=False, message="Course name is required"), 400
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
     try:
-        # Insert the new course into the Courses table
-        cursor.execute(
-            "INSERT INTO Courses (proctor_id, name, filepath) VALUES (%s, %s, %s) RETURNING id",
-            (proctor_id, course_name, f"{folder_prefix}{course_name}/")
-        )
-        conn.commit()
-
-        # Get the course ID and filepath
-        course_id = cursor.fetchone()[0]
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                # Insert the new course into the Courses table
+                cursor.execute(
+                    "INSERT INTO Courses (proctor_id, name, filepath) VALUES (%s, %s, %s) RETURNING id",
+                    (proctor_id, course_name, f"{folder_prefix}{course_name}/")
+                )
+
+                # Get the course ID and filepath
+                course_id = cursor.fetchone()[0]
+        invalidate_proctor(proctor_id)
         course_path = f"{folder_prefix}/{course_name}/"
 
         # Create the course folder in the bucket
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(course_path)
-        if not blob.exists():
-            blob.upload_from_string("", content_type="application/x-www-form-urlencoded")
+        if not get_storage().exists(course_path):
+            get_storage().put(course_path, "", content_type="application/x-www-form-urlencoded")
 
         return jsonify(success=True, course={"id": course_id, "name": course_name, "filepath": course_path}), 200
 
+    except psycopg2.errors.UniqueViolation:
+        return jsonify(success=False, message="A course with this name already exists"), 409
     except Exception as e:
-        conn.rollback()
         return jsonify(success=False, message=str(e)), 500
-    finally:
-        cursor.close()
-        conn.close()
 
+# Read or change the model settings of one of the proctor's courses (empty values use the server defaults)
+@app.route('/course-settings', methods=['GET', 'POST'])
+def course_settings():
+    proctor_id = session.get("id")
+    if not proctor_id or not session.get("folder_prefix"):
+        return jsonify(success=False, message="Unauthorized"), 401
 
-def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS
-    )
-    return conn
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    course_name = data.get("course_name", '')
+    if not course_name:
+        return jsonify(success=False, message="Course name is required"), 400
+
+    try:
+        course_id = get_proctor_course_id(proctor_id, course_name)
+        if course_id is None:
+            return jsonify(success=False, message="Course not found"), 404
+
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                if request.method == 'POST':
+                    try:
+                        settings = validate_course_settings(data)
+                    except ValueError as e:
+                        return jsonify(success=False, message=str(e)), 400
+                    cursor.execute(
+                        "UPDATE Courses SET model = %s, fast_model = %s, temperature = %s, max_tokens = %s WHERE id = %s",
+                        (settings["model"], settings["fast_model"], settings["temperature"], settings["max_tokens"], course_id)
+                    )
+                cursor.execute("SELECT model, fast_model, temperature, max_tokens FROM Courses WHERE id = %s", (course_id,))
+                model, fast_model, temperature, max_tokens = cursor.fetchone()
+        if request.method == 'POST':
+            answer_cache.invalidate(course_id)  # answers cached by this worker came from the old settings
+
+        return jsonify(
+            success=True,
+            settings={"model": model, "fast_model": fast_model, "temperature": temperature, "max_tokens": max_tokens},
+            defaults={"model": DEFAULT_MODEL, "fast_model": FAST_MODEL, "temperature": DEFAULT_TEMPERATURE, "max_tokens": DEFAULT_MAX_TOKENS},
+        ), 200
+    except Exception as e:
+        return jsonify(success=False, message=str(e)), 500
+
+# Load a user's courses into the identity cache at login, so their first requests skip the database
+def warm_identity_cache(role, username, user_id):
+    if role == 'student':
+        identity_cache.put("student_id", username, user_id)
+        cached_student_courses(user_id, refresh=True)
+    else:
+        cached_proctor_courses(user_id, refresh=True)
 
 @app.route("/login", methods=["POST"])
 def login():
@@ -338,42 +576,34 @@ def login():
     role = data.get("role")  # Either "student" or "proctor"
 
     table = "Students" if role == "student" else "Proctors"
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    try:
-        # Check if user exists
-        cursor.execute(f"SELECT id, password FROM {table} WHERE username = %s", (username,))
-        user = cursor.fetchone()
-
-        if user:
-            # User exists, check password
-            if user[1] == password:
-                session["id"] = user[0] #first changing the session id and pass, making bucket if one doesnt exist
-                session['username'] = username
-                if role == 'proctor':
-                    session['folder_prefix'] = f"{session.get('username')}_{session.get('id')}"
-                    ensure_user_folder_exists()
-                return jsonify({"success": True, "message": "Login successful", "route": f"/{role}"})
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Check if user exists
+            cursor.execute(f"SELECT id, password FROM {table} WHERE username = %s", (username,))
+            user = cursor.fetchone()
+
+            if user:
+                # User exists, check password
+                if user[1] != password:
+                    return jsonify({"success": False, "message": "Incorrect password"}), 401
+                user_id, message = user[0], "Login successful"
             else:
-                return jsonify({"success": False, "message": "Incorrect password"}), 401
-        else:
-            # User doesn't exist, create account
-            cursor.execute(f"INSERT INTO {table} (username, password) VALUES (%s, %s) RETURNING id", (username, password))
-            user_id = cursor.fetchone()[0]  # Fetch the new ID
-            conn.commit()
-
-            session["id"] = user_id #first changing the session id and pass, making bucket if one doesnt exist
-            session['username'] = username
-            if role == 'proctor':
-                    session['folder_prefix'] = f"{session.get('username')}_{session.get('id')}"
-                    ensure_user_folder_exists()            
-            return jsonify({"success": True, "message": "Account created", "route": f"/{role}"})
-    
-    finally:
-        # Ensure the cursor and connection are closed
-        cursor.close()
-        conn.close()
+                # User doesn't exist, create account
+                cursor.execute(f"INSERT INTO {table} (username, password) VALUES (%s, %s) RETURNING id", (username, password))
+                user_id = cursor.fetchone()[0]  # Fetch the new ID
+                conn.commit()
+                message = "Account created"
+
+    # The connection is back in the pool before the bucket and the identity cache are touched, since
+    # warming the cache borrows a connection of its own
+    session["id"] = user_id #first changing the session id and pass, making bucket if one doesnt exist
+    session['username'] = username
+    if role == 'proctor':
+        session['folder_prefix'] = f"{session.get('username')}_{session.get('id')}"
+        ensure_user_folder_exists()
+    warm_identity_cache(role, username, user_id)
+    return jsonify({"success": True, "message": message, "route": f"/{role}"})
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,176 @@
+"""
+ASGI entry point. /ask-question and /ask-question-stream are answered by asyncio handlers, so a
+single process can keep hundreds of tutor calls waiting on OpenAI at once; every other route is
+the Flask app, run through asgiref's WSGI adapter on a pool of WSGI_THREADS threads.
+
+    gunicorn -k uvicorn.workers.UvicornWorker -b :$PORT asgi:application
+
+The WSGI entry point (gunicorn app:app) still works and answers both routes synchronously.
+"""
+import os
+import json
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from werkzeug.http import parse_cookie
+
+from app import app, sse_event
+from take_prompts import generate_gpt_response_async, generate_gpt_response_stream_async
+from metrics import observe
+from rate_limit import RateLimited
+
+# Largest /ask-question request body accepted (bytes)
+MAX_QUESTION_BODY = 64 * 1024
+
+# Threads that run Flask requests; asgiref's default runs every WSGI request on one shared thread
+WSGI_THREADS = int(os.environ.get("WSGI_THREADS", 32))
+
+_wsgi_executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="flask")
+
+
+class ThreadedWsgiToAsgiInstance(WsgiToAsgiInstance):
+    """
+    Runs the WSGI app on the Flask thread pool instead of asgiref's single thread-sensitive
+    thread, so slow Flask requests (uploads, downloads) do not queue behind each other.
+    """
+
+    run_wsgi_app = sync_to_async(
+        WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False, executor=_wsgi_executor
+    )
+
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadedWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+flask_application = ThreadedWsgiToAsgi(app)
+
+
+# Function to read the Flask session from the request cookie (signed with the app's secret key)
+def read_session(scope):
+    cookie_header = "; ".join(value.decode("latin-1") for name, value in scope["headers"] if name == b"cookie")
+    cookie = parse_cookie(cookie_header).get(app.config["SESSION_COOKIE_NAME"])
+    if not cookie:
+        return {}
+    serializer = app.session_interface.get_signing_serializer(app)
+    try:
+        return serializer.loads(cookie, max_age=int(app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return {}
+
+# Function to read the whole request body
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if len(body) > MAX_QUESTION_BODY:
+            raise ValueError("Request body too large")
+        if not message.get("more_body"):
+            return body
+
+async def send_json(send, status, data, headers=()):
+    body = json.dumps(data).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+# Async version of the /ask-question route in app.py
+async def ask_question(scope, receive, send):
+    started = time.perf_counter()
+    headers = []
+    try:
+        data = json.loads(await read_body(receive) or b"{}")
+        student_id = read_session(scope).get('id')
+        course_name = data.get('courseName')
+        question = data.get('question')
+
+        if not (student_id and course_name and question):
+            status, payload = 400, {'success': False, 'message': 'Missing required parameters.'}
+        else:
+            tutor_response, citations = await generate_gpt_response_async(student_id, course_name, question)
+            status, payload = 200, {'success': True, 'response': tutor_response, 'citations': citations}
+    except RateLimited as e:
+        status, payload = 429, {'success': False, 'message': str(e)}
+        headers.append((b"retry-after", str(e.retry_after).encode()))
+    except Exception as e:
+        status, payload = 500, {'success': False, 'message': str(e)}
+    await send_json(send, status, payload, headers)
+    observe("tutor_request_seconds", time.perf_counter() - started, help="HTTP request duration",
+            endpoint="ask_question", method="POST", status=status)
+
+
+# Function to wait until the client goes away (read once the request body has been received)
+async def wait_for_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+# Async version of the /ask-question-stream route in app.py: the answer is sent as Server-Sent Events
+# while the model generates it, and the model call is cancelled if the student disconnects
+async def ask_question_stream(scope, receive, send):
+    started = time.perf_counter()
+    try:
+        data = json.loads(await read_body(receive) or b"{}")
+    except ValueError as e:
+        await send_json(send, 400, {'success': False, 'message': str(e)})
+        return
+    student_id = read_session(scope).get('id')
+    course_name = data.get('courseName')
+    question = data.get('question')
+    if not (student_id and course_name and question):
+        await send_json(send, 400, {'success': False, 'message': 'Missing required parameters.'})
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"text/event-stream; charset=utf-8"), (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no")],
+    })
+
+    async def send_event(data, event=None):
+        await send({"type": "http.response.body", "body": sse_event(data, event).encode(), "more_body": True})
+
+    async def events():
+        citations = []
+        try:
+            async for delta in generate_gpt_response_stream_async(student_id, course_name, question, citations):
+                await send_event({'delta': delta})
+            await send_event({'success': True, 'citations': citations}, event='done')
+        except RateLimited as e:
+            await send_event({'success': False, 'message': str(e), 'retry_after': e.retry_after}, event='error')
+        except Exception as e:
+            await send_event({'success': False, 'message': str(e)}, event='error')
+
+    streaming = asyncio.ensure_future(events())
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    await asyncio.wait({streaming, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+    if disconnected.done():
+        streaming.cancel()  # closes the model stream and frees its model call slot
+        await asyncio.gather(streaming, return_exceptions=True)
+    else:
+        disconnected.cancel()
+        await send({"type": "http.response.body", "body": b""})
+    observe("tutor_request_seconds", time.perf_counter() - started, help="HTTP request duration",
+            endpoint="ask_question_stream", method="POST", status=200)
+
+
+# Routes answered on the event loop; everything else goes to Flask
+ASYNC_ROUTES = {
+    "/ask-question": ask_question,
+    "/ask-question-stream": ask_question_stream,
+}
+
+async def application(scope, receive, send):
+    handler = ASYNC_ROUTES.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+    if handler is not None:
+        await handler(scope, receive, send)
+    else:
+        await flask_application(scope, receive, send)
@@ -0,0 +1,91 @@
+"""
+Micro-benchmarks for the document extraction functions in train/read_docs.py, run on
+synthetic PDFs and PPTX decks (no network, database or storage needed).
+
+    python bench/extraction_bench.py --pdf-pages 300 --pptx-slides 100 --repeat 5
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "train"))
+sys.path.insert(0, ROOT)
+
+import read_docs
+from storage_backend import MemoryStorage, set_storage
+from synthetic_docs import make_pdf, make_pptx
+
+# Function to time a callable `repeat` times and return (median seconds, result of the last run)
+def time_call(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark read_docs.py extraction on synthetic documents")
+    parser.add_argument("--pdf-pages", type=int, default=100)
+    parser.add_argument("--image-pages", type=int, default=0, help="image-only pages at the start of the PDF")
+    parser.add_argument("--pptx-slides", type=int, default=50)
+    parser.add_argument("--docs", type=int, default=8, help="documents in the end-to-end pipeline benchmark")
+    parser.add_argument("--parse-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf = make_pdf(args.pdf_pages, image_pages=args.image_pages)
+    pptx = make_pptx(args.pptx_slides)
+    print(f"Synthetic PDF: {args.pdf_pages} pages, {len(pdf) / 1024:.0f} KiB; "
+          f"PPTX: {args.pptx_slides} slides, {len(pptx) / 1024:.0f} KiB; median of {args.repeat} runs\n")
+
+    benchmarks = [
+        ("extract_text_from_pdf", lambda: read_docs.extract_text_from_pdf(pdf), args.pdf_pages),
+        ("extract_pdf_pages", lambda: read_docs.extract_pdf_pages(pdf), args.pdf_pages),
+        ("process_pdf", lambda: read_docs.process_pdf(pdf), args.pdf_pages),
+        ("extract_text_from_pptx", lambda: read_docs.extract_text_from_pptx(pptx), args.pptx_slides),
+        ("extract_pptx_slides", lambda: read_docs.extract_pptx_slides(pptx), args.pptx_slides),
+    ]
+    print(f"{'function':<28}{'median ms':>12}{'ms/page':>10}{'chars':>10}")
+    for name, func, units in benchmarks:
+        seconds, result = time_call(func, args.repeat)
+        chars = len(result) if isinstance(result, str) else sum(len(r["text"]) for r in result)
+        print(f"{name:<28}{seconds * 1000:>12.1f}{seconds * 1000 / units:>10.2f}{chars:>10}")
+
+    # Peak Python memory of the PPTX readers (the old reader builds python-pptx's tree for the whole
+    # deck; iter_pptx_slides parses one slide at a time)
+    print(f"\n{'PPTX reader':<28}{'peak MiB':>12}")
+    pptx_readers = [
+        ("extract_text_from_pptx", lambda: len(read_docs.extract_text_from_pptx(pptx))),
+        ("iter_pptx_slides", lambda: sum(len(slide["text"]) for slide in read_docs.iter_pptx_slides(pptx))),
+    ]
+    for name, func in pptx_readers:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{name:<28}{peak / 2 ** 20:>12.1f}")
+
+    # End-to-end ingestion of a course folder from in-memory storage (serial vs. parallel parsing)
+    storage = MemoryStorage()
+    for i in range(args.docs):
+        if i % 2:
+            storage.put(f"bench_1/course/deck{i}.pptx", make_pptx(args.pptx_slides, seed=i))
+        else:
+            storage.put(f"bench_1/course/notes{i}.pdf", make_pdf(args.pdf_pages, seed=i))
+    set_storage(storage)
+    print(f"\n{'read_doc_records_from_gcs':<28}{'workers':>8}{'median ms':>12}")
+    for workers in sorted({1, args.parse_workers}):
+        seconds, _ = time_call(
+            lambda: read_docs.read_doc_records_from_gcs("bench", "course", 1, parse_workers=workers, use_cache=False),
+            args.repeat
+        )
+        print(f"{f'{args.docs} documents':<28}{workers:>8}{seconds * 1000:>12.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Minimal stand-in for the OpenAI chat completions API, for local testing and benchmarking
+without an API key or network access.
+
+Run it and point the app at it:
+    python bench/fake_openai.py --port 8001 --latency 0.5 --tokens-per-second 50
+    OPENAI_BASE_URL=http://localhost:8001/v1 OPENAI_API_KEY=fake python app.py
+
+Supports POST /v1/chat/completions, both normal and `"stream": true` (Server-Sent Events).
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = (
+    "Good question! Think about what the course notes say about this topic, "
+    "and try to work out the first step on your own before we go further."
+)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    # Set by make_server
+    latency = 0.0
+    tokens_per_second = 0.0
+    answer = DEFAULT_ANSWER
+    requests_seen = 0
+    counter_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output clean
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.counter_lock:
+            type(self).requests_seen += 1
+
+        time.sleep(self.latency)
+        words = self.answer.split(" ")
+        max_tokens = body.get("max_tokens") or len(words)
+        words = words[:max_tokens]
+        model = body.get("model", "gpt-4o")
+        prompt_tokens = sum(len(str(m.get("content", ""))) // 4 + 1 for m in body.get("messages", []))
+
+        if body.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i, word in enumerate(words):
+                delta = word if i == 0 else " " + word
+                self._send_event({
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+                })
+                if self.tokens_per_second:
+                    time.sleep(1 / self.tokens_per_second)
+            self._send_event({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            })
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            return
+
+        if self.tokens_per_second:
+            time.sleep(len(words) / self.tokens_per_second)
+        payload = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": " ".join(words)},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(words),
+                "total_tokens": prompt_tokens + len(words),
+            },
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_event(self, data):
+        self.wfile.write(f"data: {json.dumps(data)}\n\n".encode())
+        self.wfile.flush()
+
+
+# Function to build a fake server (call serve_forever, or use start_in_thread from tests/benchmarks)
+def make_server(host="127.0.0.1", port=8001, latency=0.0, tokens_per_second=0.0, answer=DEFAULT_ANSWER):
+    handler = type("ConfiguredFakeOpenAIHandler", (FakeOpenAIHandler,), {
+        "latency": latency,
+        "tokens_per_second": tokens_per_second,
+        "answer": answer,
+        "requests_seen": 0,
+    })
+    return ThreadingHTTPServer((host, port), handler)
+
+
+# Function to run a fake server in a daemon thread; returns (server, base_url)
+def start_in_thread(**kwargs):
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="generation speed (0 = instant)")
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.latency, args.tokens_per_second)
+    print(f"Fake OpenAI server listening on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
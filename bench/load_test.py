@@ -0,0 +1,261 @@
+"""
+Load test for the tutor request path: simulated students and proctors hit /ask-question,
+/load-docs, /assign-student and /train concurrently, and p50/p95/p99 latency and
+requests/sec are reported per scenario.
+
+By default the app runs in-process (Flask test client) against:
+  - the fake OpenAI server from bench/fake_openai.py (configurable latency / token rate),
+  - the local-disk storage backend in a temporary directory,
+  - the Postgres database from DB_HOST/DB_NAME/DB_USER/DB_PASS. Use a throwaway database:
+    the app relies on Postgres features, so there is no SQLite stand-in, and --reset-db
+    drops every table and recreates the schema from migrations/.
+
+    python bench/load_test.py --reset-db --students 50 --duration 30 --openai-latency 0.8 --tokens-per-second 40
+
+The in-process app runs with the rate limiter off (RATE_LIMIT_ENABLED=0) unless --rate-limit is
+given, so the numbers measure the request path rather than the limiter. 429 responses are reported
+in their own column, not as errors.
+
+Pass --url http://host:port to drive an already running server instead (start it with
+OPENAI_BASE_URL pointing at a fake server, STORAGE_BACKEND=local and RATE_LIMIT_ENABLED=0 for
+comparable numbers).
+"""
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "train"))
+sys.path.insert(0, ROOT)
+
+from fake_openai import start_in_thread
+from stats import summarize, print_table
+from synthetic_docs import make_pdf, make_pptx
+
+QUESTIONS = [
+    "What is a p-value?",
+    "How do I interpret a confidence interval?",
+    "What is the difference between the null and alternative hypothesis?",
+    "When should I use a binomial distribution?",
+    "Can you explain bias of an estimator?",
+    "What does the regression coefficient mean?",
+    "How is the posterior related to the prior in Bayes rule?",
+    "Why do we divide by n-1 in the sample variance?",
+]
+
+
+class InProcessClient:
+    """
+    Flask test client with its own cookie jar (one per simulated user).
+    """
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json=None, data=None):
+        response = self.client.open(path, method=method, json=json, data=data)
+        return response.status_code, response.get_json(silent=True)
+
+
+class HttpClient:
+    """
+    requests.Session against a running server (one per simulated user).
+    """
+
+    def __init__(self, base_url):
+        import requests
+
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def request(self, method, path, json=None, data=None):
+        files = None
+        if data and "file" in data:
+            data = dict(data)
+            fileobj, filename = data.pop("file")  # test client order is (file, name); requests wants (name, file)
+            files = {"file": (filename, fileobj)}
+        response = self.session.request(method, self.base_url + path, json=json, data=data, files=files)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+
+# Function to log a user in (accounts are created on first login)
+def login(client, username, role):
+    status, body = client.request("POST", "/login", json={"username": username, "password": "bench", "role": role})
+    if status != 200 or not body or not body.get("success"):
+        raise RuntimeError(f"Login failed for {username}: {status} {body}")
+
+# Returned by a scenario action when the server answered 429 (rate limited)
+LIMITED = "limited"
+
+# Function to run `action` in a loop on `users` threads for `duration` seconds, timing each call;
+# the action returns True (success), False (error) or LIMITED
+def run_scenario(name, clients, action, duration, max_iterations=None):
+    latencies = []
+    errors = [0]
+    limited = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    iterations = [0]
+
+    def worker(index, client):
+        rng = random.Random(index)
+        while time.monotonic() < deadline:
+            with lock:
+                if max_iterations is not None and iterations[0] >= max_iterations:
+                    return
+                iterations[0] += 1
+            start = time.perf_counter()
+            try:
+                ok = action(client, rng, index)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok == LIMITED:
+                    limited[0] += 1
+                elif ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker, args=(i, client)) for i, client in enumerate(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(name, latencies, time.perf_counter() - started, errors[0], limited[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the AI tutor request path")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--students", type=int, default=20, help="concurrent simulated students")
+    parser.add_argument("--proctors", type=int, default=2, help="concurrent proctor sessions for proctor scenarios")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per scenario")
+    parser.add_argument("--scenarios", default="ask,load-docs,assign-student,train")
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="fake model generation speed")
+    parser.add_argument("--docs", type=int, default=4, help="synthetic documents uploaded to the course")
+    parser.add_argument("--unique-questions", action="store_true", help="make every question distinct (no answer cache hits)")
+    parser.add_argument("--rate-limit", action="store_true", help="keep the app's rate limiter on (in-process app only)")
+    parser.add_argument("--reset-db", action="store_true", help="DROP and recreate all tables first (throwaway DB only!)")
+    args = parser.parse_args()
+
+    run_id = f"{int(time.time())}"
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        fake_server, base_url = start_in_thread(port=0, latency=args.openai_latency, tokens_per_second=args.tokens_per_second)
+        os.environ["OPENAI_BASE_URL"] = base_url
+        os.environ["OPENAI_API_KEY"] = "fake"
+        os.environ.setdefault("STORAGE_BACKEND", "local")
+        os.environ.setdefault("STORAGE_LOCAL_ROOT", tempfile.mkdtemp(prefix="tutor-bench-"))
+        # Read when rate_limit.py is imported, so set before importing the app
+        os.environ["RATE_LIMIT_ENABLED"] = "1" if args.rate_limit else "0"
+        if args.reset_db:
+            from migrate import reset_schema, apply_migrations
+            reset_schema()
+            apply_migrations()
+        from app import app
+        app.testing = True
+        make_client = lambda: InProcessClient(app)
+        print(f"Fake OpenAI at {base_url}, storage in {os.environ['STORAGE_LOCAL_ROOT']}")
+
+    # Setup: a proctor with one trained course, and enrolled students
+    course_name = f"Bench Course {run_id}"
+    proctor_name = f"bench_proctor_{run_id}"
+    proctors = [make_client() for _ in range(max(args.proctors, 1))]
+    for proctor in proctors:
+        login(proctor, proctor_name, "proctor")
+    status, body = proctors[0].request("POST", "/add-course", json={"name": course_name})
+    if status != 200:
+        raise RuntimeError(f"Could not create course: {status} {body}")
+    for i in range(args.docs):
+        name, data = (f"notes{i}.pdf", make_pdf(30, seed=i)) if i % 2 == 0 else (f"deck{i}.pptx", make_pptx(20, seed=i))
+        proctors[0].request("POST", "/upload", data={"course": course_name, "file": (io.BytesIO(data), name)})
+
+    print("Training the benchmark course...")
+    status, body = proctors[0].request("POST", "/train", json={"course_name": course_name})
+    job_id = body.get("job_id") if body else None
+    while job_id:
+        status, body = proctors[0].request("GET", f"/train-status/{job_id}")
+        if not body or body["job"]["status"] in ("succeeded", "failed"):
+            print(f"Training {body['job']['status'] if body else 'unknown'}")
+            break
+        time.sleep(0.5)
+
+    students = []
+    for i in range(args.students):
+        client = make_client()
+        username = f"bench_student_{run_id}_{i}"
+        login(client, username, "student")
+        proctors[0].request("POST", "/assign-student", json={"username": username, "course_name": course_name})
+        students.append(client)
+
+    counter = [0]
+    counter_lock = threading.Lock()
+
+    def ask(client, rng, index):
+        question = rng.choice(QUESTIONS)
+        if args.unique_questions:
+            with counter_lock:
+                counter[0] += 1
+                question = f"{question} (variant {counter[0]})"
+        status, body = client.request("POST", "/ask-question", json={"question": question, "courseName": course_name})
+        if status == 429:
+            return LIMITED
+        return status == 200 and body and body.get("success") and not body["response"].startswith("An error occurred")
+
+    def load_docs(client, rng, index):
+        status, _ = client.request("GET", "/load-docs")
+        return status == 200
+
+    def assign_student(client, rng, index):
+        with counter_lock:
+            counter[0] += 1
+            username = f"bench_new_{run_id}_{counter[0]}"
+        new_student = make_client()
+        login(new_student, username, "student")
+        status, body = client.request("POST", "/assign-student", json={"username": username, "course_name": course_name})
+        return status == 200
+
+    def train(client, rng, index):
+        status, body = client.request("POST", "/train", json={"course_name": course_name})
+        if status not in (200, 202):
+            return False
+        job_id = body["job_id"]
+        while True:
+            status, body = client.request("GET", f"/train-status/{job_id}")
+            if status != 200 or body["job"]["status"] == "failed":
+                return False
+            if body["job"]["status"] == "succeeded":
+                return True
+            time.sleep(0.2)
+
+    scenarios = {
+        "ask": (f"/ask-question x{args.students}", students, ask, None),
+        "load-docs": (f"/load-docs x{len(proctors)}", proctors, load_docs, None),
+        "assign-student": (f"/assign-student x{len(proctors)}", proctors, assign_student, None),
+        "train": ("/train (end to end)", proctors[:1], train, 3),
+    }
+    results = []
+    for key in args.scenarios.split(","):
+        name, clients, action, max_iterations = scenarios[key.strip()]
+        print(f"Running {name} for up to {args.duration:.0f}s...")
+        results.append(run_scenario(name, clients, action, args.duration, max_iterations))
+
+    print()
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import math
+
+# Function to get the p-th percentile (0-100) of a list of numbers, nearest-rank method
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+# Function to summarize latencies (seconds) measured over `elapsed` wall-clock seconds
+def summarize(name, latencies, elapsed, errors=0, limited=0):
+    count = len(latencies)
+    return {
+        "name": name,
+        "requests": count,
+        "errors": errors,
+        "limited": limited,
+        "rps": count / elapsed if elapsed else 0.0,
+        "mean_ms": 1000 * sum(latencies) / count if count else float("nan"),
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+    }
+
+# Function to print summaries as a fixed-width table
+def print_table(rows):
+    print(f"{'scenario':<28}{'reqs':>7}{'errs':>6}{'429s':>6}{'req/s':>9}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for row in rows:
+        print(
+            f"{row['name']:<28}{row['requests']:>7}{row['errors']:>6}{row['limited']:>6}{row['rps']:>9.1f}"
+            f"{row['mean_ms']:>10.1f}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}"
+        )
@@ -0,0 +1,55 @@
+import io
+import random
+
+import fitz  # PyMuPDF
+from pptx import Presentation
+from pptx.util import Inches
+
+VOCABULARY = (
+    "probability distribution sample mean variance hypothesis test null alternative p-value "
+    "confidence interval regression coefficient residual correlation estimator bias likelihood "
+    "bayes prior posterior random variable expectation standard deviation normal binomial"
+).split()
+
+# Function to make a paragraph of course-like filler text
+def lecture_text(words, rng):
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+# Function to build a synthetic lecture PDF; `image_pages` pages carry only an image (to exercise OCR detection)
+def make_pdf(pages=20, words_per_page=250, image_pages=0, seed=0):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        if page_num < image_pages:
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 64, 64), 0)
+            page.insert_image(fitz.Rect(72, 72, 400, 400), pixmap=pix)
+            continue
+        page.insert_text((72, 60), f"Lecture {seed} - Page {page_num + 1}", fontsize=14)
+        page.insert_textbox(fitz.Rect(72, 80, 540, 760), lecture_text(words_per_page, rng), fontsize=10)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+# Function to build a synthetic slide deck with a title, bullet text box, a group of two text
+# boxes, a table and speaker notes on every slide
+def make_pptx(slides=30, words_per_slide=60, seed=0):
+    rng = random.Random(seed)
+    prs = Presentation()
+    layout = prs.slide_layouts[5]  # title only
+    for slide_num in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Lecture {seed} - Slide {slide_num + 1}"
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(3))
+        box.text_frame.text = lecture_text(words_per_slide, rng)
+        group = slide.shapes.add_group_shape()
+        for col in range(2):
+            group.shapes.add_textbox(Inches(0.5 + 4.5 * col), Inches(4.3), Inches(4), Inches(0.5)).text_frame.text = lecture_text(8, rng)
+        table = slide.shapes.add_table(2, 3, Inches(0.5), Inches(5), Inches(9), Inches(1)).table
+        for row in range(2):
+            for col in range(3):
+                table.cell(row, col).text = rng.choice(VOCABULARY)
+        slide.notes_slide.notes_text_frame.text = lecture_text(20, rng)
+    buffer = io.BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
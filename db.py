@@ -0,0 +1,166 @@
+import os
+import time
+import logging
+import threading
+import traceback
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extensions import cursor as base_cursor
+from dotenv import load_dotenv
+
+from metrics import span, observe
+
+load_dotenv()
+
+DB_HOST = os.environ.get("DB_HOST")
+DB_NAME = os.environ.get("DB_NAME")
+DB_USER = os.environ.get("DB_USER")
+DB_PASS = os.environ.get("DB_PASS")
+
+# Pool settings
+DB_POOL_MIN = int(os.environ.get("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.environ.get("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 10))  # seconds to wait for a free connection
+DB_POOL_LEAK_SECONDS = float(os.environ.get("DB_POOL_LEAK_SECONDS", 60))  # held longer than this is reported
+DB_HEALTH_CHECK_IDLE = float(os.environ.get("DB_HEALTH_CHECK_IDLE", 30))  # ping connections idle longer than this
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+_slots = None
+_checked_out = {}  # id(conn) -> (checkout time, stack)
+_last_used = {}  # id(conn) -> time returned to the pool
+
+
+class TimedCursor(base_cursor):
+    """
+    Cursor that records every query as a db.query span, labelled by statement type.
+    """
+
+    def execute(self, query, vars=None):
+        operation = query.lstrip().split(None, 1)[0].upper() if isinstance(query, str) and query.strip() else "OTHER"
+        with span("db.query", operation=operation):
+            return super().execute(query, vars)
+
+
+# Function to lazily create the pool (once per process, so forked gunicorn workers get their own)
+def get_pool():
+    global _pool, _pool_pid, _slots
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = pool.ThreadedConnectionPool(
+                    DB_POOL_MIN,
+                    DB_POOL_MAX,
+                    host=DB_HOST,
+                    dbname=DB_NAME,
+                    user=DB_USER,
+                    password=DB_PASS,
+                    cursor_factory=TimedCursor
+                )
+                _pool_pid = os.getpid()
+                _slots = threading.BoundedSemaphore(DB_POOL_MAX)
+                _checked_out.clear()
+                _last_used.clear()
+    return _pool
+
+
+# Check that a pooled connection is still usable before handing it out
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    idle_since = _last_used.get(id(conn))
+    if idle_since is not None and time.monotonic() - idle_since < DB_HEALTH_CHECK_IDLE:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+# Log connections that have been checked out for too long (usually a missing release)
+def check_for_leaks():
+    now = time.monotonic()
+    leaks = []
+    with _pool_lock:
+        for checked_out_at, stack in _checked_out.values():
+            if now - checked_out_at > DB_POOL_LEAK_SECONDS:
+                leaks.append((now - checked_out_at, stack))
+    for held_for, stack in leaks:
+        logger.warning("Database connection held for %.0fs, checked out at:\n%s", held_for, stack)
+    return len(leaks)
+
+
+def _acquire():
+    db_pool = get_pool()
+    wait_started = time.perf_counter()
+    if not _slots.acquire(timeout=DB_POOL_TIMEOUT):
+        check_for_leaks()
+        raise pool.PoolError(f"No database connection available after {DB_POOL_TIMEOUT}s")
+    try:
+        conn = db_pool.getconn()
+        if not _is_healthy(conn):
+            db_pool.putconn(conn, close=True)
+            conn = db_pool.getconn()
+    except Exception:
+        _slots.release()
+        raise
+    with _pool_lock:
+        _checked_out[id(conn)] = (time.monotonic(), "".join(traceback.format_stack(limit=8)[:-2]))
+    observe("tutor_db_pool_wait_seconds", time.perf_counter() - wait_started, help="Time waiting for a pooled connection")
+    return conn
+
+
+def _release(conn, broken=False):
+    with _pool_lock:
+        _checked_out.pop(id(conn), None)
+        _last_used[id(conn)] = time.monotonic()
+    try:
+        get_pool().putconn(conn, close=broken or conn.closed)
+    finally:
+        _slots.release()
+
+
+@contextmanager
+def get_db_connection():
+    """
+    Borrows a connection from the shared pool. Commits when the block finishes,
+    rolls back if it raises, and always returns the connection to the pool.
+
+    Usage:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                ...
+    """
+    conn = _acquire()
+    broken = False
+    try:
+        yield conn
+        if not conn.closed:
+            conn.commit()
+    except Exception as e:
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        raise
+    finally:
+        _release(conn, broken)
+
+
+# Close every pooled connection (used on shutdown and by the training script)
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.closeall()
+        _pool = None
@@ -0,0 +1,95 @@
+import hashlib
+
+from db import get_db_connection
+
+# Document types that can be uploaded and trained on
+ALLOWED_EXTENSIONS = {'pdf', 'pptx'}
+
+# Function to add or refresh a file in the document manifest (called after an upload)
+def record_document(folder_prefix, blob_name, size=None, generation=None):
+    query = """
+    INSERT INTO Documents (folder_prefix, blob_name, doc_type, size, generation)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (blob_name) DO UPDATE SET
+        size = EXCLUDED.size,
+        generation = EXCLUDED.generation,
+        updated_at = NOW()
+    """
+    doc_type = blob_name.rsplit('.', 1)[-1].lower()
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (folder_prefix, blob_name, doc_type, size, str(generation) if generation else None))
+
+# Function to remove a file from the document manifest (called after a delete)
+def remove_document(blob_name):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM Documents WHERE blob_name = %s", (blob_name,))
+
+# Function to get a folder's document count, a version tag for its listing (the tag changes whenever
+# a file is added, replaced or removed) and whether the folder has ever been synced from the bucket
+def manifest_state(folder_prefix):
+    query = """
+    SELECT COUNT(*), MAX(id), MAX(updated_at),
+           EXISTS (SELECT 1 FROM Document_Folders WHERE folder_prefix = %s)
+    FROM Documents WHERE folder_prefix = %s
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (folder_prefix, folder_prefix))
+            count, max_id, last_update, synced = cursor.fetchone()
+    etag = hashlib.md5(f"{folder_prefix}:{count}:{max_id}:{last_update}".encode()).hexdigest()
+    return etag, count, synced
+
+# Function to list a folder's documents from the manifest, one page at a time
+def list_documents(folder_prefix, limit=None, offset=0):
+    """
+    Returns the folder's documents ordered by name. Each document is a {"name", "type"}
+    dict whose name is relative to the folder prefix, as the proctor page expects.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT blob_name, doc_type FROM Documents
+                WHERE folder_prefix = %s
+                ORDER BY blob_name
+                LIMIT %s OFFSET %s
+                """,
+                (folder_prefix, limit, offset)
+            )
+            documents = [
+                {'name': blob_name[len(folder_prefix):], 'type': doc_type}
+                for blob_name, doc_type in cursor.fetchall()
+            ]
+    return documents
+
+# Function to rebuild a folder's manifest from a bucket listing (for folders created before the manifest existed);
+# only files inside the folder ("<folder_prefix>/...") are kept, whatever prefix the listing used
+def sync_documents(folder_prefix, blobs):
+    rows = [
+        (folder_prefix, blob.name, blob.name.rsplit('.', 1)[-1].lower(), blob.size,
+         str(blob.generation) if blob.generation else None)
+        for blob in blobs
+        if blob.name.startswith(folder_prefix + '/') and not blob.name.endswith('/')
+        and blob.name.rsplit('.', 1)[-1].lower() in ALLOWED_EXTENSIONS
+    ]
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM Documents WHERE folder_prefix = %s", (folder_prefix,))
+            for row in rows:
+                cursor.execute(
+                    """
+                    INSERT INTO Documents (folder_prefix, blob_name, doc_type, size, generation)
+                    VALUES (%s, %s, %s, %s, %s)
+                    """,
+                    row
+                )
+            cursor.execute(
+                """
+                INSERT INTO Document_Folders (folder_prefix) VALUES (%s)
+                ON CONFLICT (folder_prefix) DO UPDATE SET synced_at = NOW()
+                """,
+                (folder_prefix,)
+            )
+    return len(rows)
@@ -0,0 +1,176 @@
+import os
+import mmap
+import time
+import struct
+import threading
+
+from db import get_db_connection
+
+# Identity cache settings: seconds a cached entry is trusted, and an optional file (ideally on
+# /dev/shm) that lets every worker process on the host see each other's invalidations
+IDENTITY_CACHE_ENABLED = os.environ.get("IDENTITY_CACHE_ENABLED", "1") == "1"
+IDENTITY_CACHE_TTL = float(os.environ.get("IDENTITY_CACHE_TTL", 60))
+IDENTITY_CACHE_SHARED_FILE = os.environ.get("IDENTITY_CACHE_SHARED_FILE", "")
+
+
+class SharedGeneration:
+    """
+    A counter in a memory-mapped file. Bumping it tells the other processes on the host to
+    drop their cached entries; without a file it is a no-op.
+    """
+
+    def __init__(self, path=IDENTITY_CACHE_SHARED_FILE):
+        self.path = path
+        self.map = None
+        self.pid = None
+
+    def _mapping(self):
+        if not self.path:
+            return None
+        if self.map is None or self.pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                if os.fstat(fd).st_size < 8:
+                    os.ftruncate(fd, 8)
+                self.map = mmap.mmap(fd, 8)
+            finally:
+                os.close(fd)
+            self.pid = os.getpid()
+        return self.map
+
+    def read(self):
+        mapping = self._mapping()
+        return struct.unpack_from("Q", mapping, 0)[0] if mapping is not None else 0
+
+    def bump(self):
+        mapping = self._mapping()
+        if mapping is not None:
+            # Not atomic across processes, but a lost increment still changes the value
+            struct.pack_into("Q", mapping, 0, (struct.unpack_from("Q", mapping, 0)[0] + 1) % 2 ** 64)
+
+
+class IdentityCache:
+    """
+    In-process cache of who is who: student usernames to ids, each student's enrolled courses
+    and each proctor's courses by name. Entries expire after IDENTITY_CACHE_TTL seconds and are
+    dropped by the routes that change them (/add-course, /assign-student(s), training).
+    """
+
+    def __init__(self, ttl=IDENTITY_CACHE_TTL, shared=None):
+        self.ttl = ttl
+        self.shared = shared or SharedGeneration()
+        self.lock = threading.Lock()
+        self.seen_generation = None
+        self.version = 0  # bumped on every invalidation, so a load that raced one is not stored
+        self.entries = {}  # (kind, key) -> (stored_at, value)
+
+    def _check_shared(self):
+        generation = self.shared.read()
+        if generation != self.seen_generation:
+            self.entries.clear()
+            self.seen_generation = generation
+
+    def get(self, kind, key, loader, refresh=False):
+        """
+        Returns the cached value for (kind, key), calling loader() on a miss (or always, with
+        refresh=True, storing the fresh value). None is not cached.
+        """
+        if not IDENTITY_CACHE_ENABLED:
+            return loader()
+        now = time.monotonic()
+        with self.lock:
+            self._check_shared()
+            entry = self.entries.get((kind, key))
+            if entry and now - entry[0] <= self.ttl and not refresh:
+                return entry[1]
+            version = self.version
+        value = loader()
+        if value is not None:
+            self.put(kind, key, value, version)
+        return value
+
+    def put(self, kind, key, value, version=None):
+        if not IDENTITY_CACHE_ENABLED:
+            return
+        with self.lock:
+            self._check_shared()
+            if version is None or version == self.version:
+                self.entries[(kind, key)] = (time.monotonic(), value)
+
+    def invalidate(self, kind, key):
+        with self.lock:
+            self.entries.pop((kind, key), None)
+            self.version += 1
+        self.shared.bump()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.version += 1
+        self.shared.bump()
+
+
+# Shared cache for this process
+identity_cache = IdentityCache()
+
+
+# Function to look up a student's ID by username (unknown usernames are not cached)
+def get_student_id(username):
+    def load():
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id FROM Students WHERE username = %s", (username,))
+                row = cursor.fetchone()
+        return row[0] if row else None
+    return identity_cache.get("student_id", username, load)
+
+# Function to get the courses a student is enrolled in, as [{"id", "name"}]
+def get_student_courses(student_id, refresh=False):
+    def load():
+        query = """
+        SELECT c.id, c.name
+        FROM Courses c
+        INNER JOIN Student_Courses sc ON c.id = sc.course_id
+        WHERE sc.student_id = %s
+        ORDER BY c.id
+        """
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (student_id,))
+                return [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
+    return identity_cache.get("student_courses", student_id, load, refresh)
+
+# Function to get a proctor's courses, as [{"id", "name"}]
+def get_proctor_courses(proctor_id, refresh=False):
+    def load():
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, name FROM Courses WHERE proctor_id = %s ORDER BY id", (proctor_id,))
+                return [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
+    return identity_cache.get("proctor_courses", proctor_id, load, refresh)
+
+# Function to find one of a proctor's courses by name (None if they have no such course).
+# A miss is re-checked against the database, since another worker may have just added the course.
+def get_proctor_course_id(proctor_id, course_name):
+    for refresh in (False, True):
+        matches = [course['id'] for course in get_proctor_courses(proctor_id, refresh) if course['name'] == course_name]
+        if matches:
+            return matches[0]
+    return None
+
+# Function to find the course a student means by name among their enrollments (the newest
+# course if two proctors use the same name; None if they are not enrolled). Misses are
+# re-checked against the database, as the student may have just been enrolled by another worker.
+def get_enrolled_course_id(student_id, course_name):
+    for refresh in (False, True):
+        matches = [course['id'] for course in get_student_courses(student_id, refresh) if course['name'] == course_name]
+        if matches:
+            return max(matches)
+    return None
+
+# Functions to drop cached entries after the data behind them changes
+def invalidate_student(student_id):
+    identity_cache.invalidate("student_courses", student_id)
+
+def invalidate_proctor(proctor_id):
+    identity_cache.invalidate("proctor_courses", proctor_id)
@@ -0,0 +1,66 @@
+import os
+import sys
+import subprocess
+
+from db import get_db_connection
+
+# When enabled, enqueueing a job also starts a local worker process to drain the queue.
+# Set TRAIN_SPAWN_WORKER=0 when running `python train/worker.py` as a separate long-lived service.
+TRAIN_SPAWN_WORKER = os.environ.get("TRAIN_SPAWN_WORKER", "1") == "1"
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train", "worker.py")
+
+# Worker processes started by this web process (kept so they can be reaped once finished)
+_workers = []
+
+# Function to queue a training job and return its ID immediately
+def enqueue_training_job(username, course_name, proctor_id):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO Training_Jobs (proctor_id, username, course_name, status)
+                VALUES (%s, %s, %s, 'queued') RETURNING id
+                """,
+                (proctor_id, username, course_name)
+            )
+            job_id = cursor.fetchone()[0]
+
+    if TRAIN_SPAWN_WORKER:
+        start_worker()
+    return job_id
+
+# Function to start a background worker that processes queued jobs, then exits
+def start_worker():
+    _workers[:] = [worker for worker in _workers if worker.poll() is None]
+    _workers.append(subprocess.Popen(
+        [sys.executable, WORKER_SCRIPT, "--drain"],
+        start_new_session=True,
+        stdout=subprocess.DEVNULL,
+    ))
+
+# Function to fetch the status of a job owned by the given proctor
+def get_training_job(job_id, proctor_id):
+    query = """
+    SELECT id, course_name, status, total_docs, processed_docs, current_document, message,
+           created_at, started_at, finished_at
+    FROM Training_Jobs
+    WHERE id = %s AND proctor_id = %s
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (job_id, proctor_id))
+            row = cursor.fetchone()
+    if not row:
+        return None
+    return {
+        "id": row[0],
+        "course_name": row[1],
+        "status": row[2],
+        "total_docs": row[3],
+        "processed_docs": row[4],
+        "current_document": row[5],
+        "message": row[6],
+        "created_at": row[7].isoformat() if row[7] else None,
+        "started_at": row[8].isoformat() if row[8] else None,
+        "finished_at": row[9].isoformat() if row[9] else None,
+    }
@@ -0,0 +1,144 @@
+import os
+import json
+import time
+import logging
+import threading
+from functools import wraps
+from contextlib import contextmanager
+
+# Metrics settings: collect timings at all, and also write one structured (JSON) log line per span
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_LOG = os.environ.get("METRICS_LOG", "0") == "1"
+
+# Histogram bucket upper bounds (seconds for timings; other histograms pass their own)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (100, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+logger = logging.getLogger("tutor.metrics")
+
+_lock = threading.Lock()
+_counters = {}  # (name, labels) -> value
+_histograms = {}  # (name, labels) -> [bucket counts..., sum, count]
+_buckets = {}  # name -> bucket bounds
+_help = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+# Function to add to a counter (e.g. tokens used, cache hits)
+def count(name, value=1, help=None, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+        if help:
+            _help.setdefault(name, help)
+
+# Function to record one observation in a histogram (e.g. a duration or a prompt size)
+def observe(name, value, buckets=TIME_BUCKETS, help=None, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        bounds = _buckets.setdefault(name, buckets)
+        if help:
+            _help.setdefault(name, help)
+        series = _histograms.get(key)
+        if series is None:
+            series = _histograms[key] = [0] * (len(bounds) + 2)
+        for i, bound in enumerate(bounds):
+            if value <= bound:
+                series[i] += 1
+                break
+        series[-2] += value
+        series[-1] += 1
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times the enclosed block as tutor_span_seconds{span=name, ...}; errors are labelled.
+
+    Usage:
+        with span("model.chat", model="gpt-4o"):
+            ...
+    """
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe("tutor_span_seconds", elapsed, help="Time spent in instrumented operations", span=name, status=status, **labels)
+        if METRICS_LOG:
+            logger.info(json.dumps({"span": name, "ms": round(elapsed * 1000, 2), "status": status, **labels}))
+
+# Decorator version of span for whole functions
+def timed(name, **labels):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# Function to log a structured event (token counts, prompt sizes, ...) when METRICS_LOG is on
+def log_event(event, **fields):
+    if METRICS_ENABLED and METRICS_LOG:
+        logger.info(json.dumps({"event": event, **fields}, default=str))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+# Function to render every metric in the Prometheus text exposition format
+def render_prometheus():
+    lines = []
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(series) for key, series in _histograms.items()}
+        buckets = dict(_buckets)
+        help_text = dict(_help)
+
+    for name in sorted({name for name, _ in counters}):
+        if name in help_text:
+            lines.append(f"# HELP {name} {help_text[name]}")
+        lines.append(f"# TYPE {name} counter")
+        for (series_name, labels), value in sorted(counters.items()):
+            if series_name == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+    for name in sorted({name for name, _ in histograms}):
+        if name in help_text:
+            lines.append(f"# HELP {name} {help_text[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        bounds = buckets[name]
+        for (series_name, labels), series in sorted(histograms.items()):
+            if series_name != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip(bounds, series):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {series[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+    return "\n".join(lines) + "\n"
+
+# Function to clear all metrics (used by benchmarks between runs)
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
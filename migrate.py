@@ -0,0 +1,148 @@
+import os
+import re
+import sys
+import argparse
+import psycopg2
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Define database connection parameters
+DB_HOST = os.getenv("DB_HOST")
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASS = os.getenv("DB_PASS")
+
+# Schema changes live in migrations/NNN_description.sql and are applied once each, in order
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+# Any constant works; it only has to be the same for every process running migrations
+MIGRATION_LOCK_ID = 4004001
+
+# Tables dropped by reset_schema, children first
+APP_TABLES = [
+    "Upload_Sessions", "Document_Folders", "Documents", "Document_Extractions", "Training_Jobs", "Conversation_Turns",
+    "Course_Chunks", "Document_Records", "Student_Courses", "Courses", "Students", "Proctors", "Schema_Migrations",
+]
+
+
+def connect():
+    return psycopg2.connect(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS)
+
+# Function to list the migration files as (version, name, path), in version order
+def list_migrations(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in os.listdir(directory):
+        match = re.match(r"^(\d+)_(.+)\.sql$", filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM Schema_Migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+def apply_migrations(conn=None, verbose=True):
+    """
+    Applies every migration that has not been applied yet, each in its own transaction,
+    and records it in Schema_Migrations. Safe to run from several processes at once.
+
+    Databases created by the old createTables.sql are brought up to date the same way:
+    every migration only creates what is missing.
+
+    Returns:
+        list[int]: The versions applied by this call.
+    """
+    own_conn = conn is None
+    conn = conn or connect()
+    applied = []
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS Schema_Migrations (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT NOW()
+                )
+                """
+            )
+            conn.commit()
+            try:
+                done = applied_versions(cursor)
+                for version, name, path in list_migrations():
+                    if version in done:
+                        continue
+                    with open(path) as f:
+                        script = f.read()
+                    try:
+                        cursor.execute(script)
+                        cursor.execute("INSERT INTO Schema_Migrations (version, name) VALUES (%s, %s)", (version, name))
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    applied.append(version)
+                    if verbose:
+                        print(f"Applied migration {version:03d}_{name}")
+            finally:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+                conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    if verbose and not applied:
+        print("Database schema is up to date.")
+    return applied
+
+# Function to drop every table of the app (throwaway databases only, e.g. benchmarks)
+def reset_schema(conn=None):
+    own_conn = conn is None
+    conn = conn or connect()
+    try:
+        with conn.cursor() as cursor:
+            for table in APP_TABLES:
+                cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+# Function to print each migration and whether it has been applied
+def print_status():
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+            done = applied_versions(cursor) if cursor.fetchone()[0] else set()
+    finally:
+        conn.close()
+    for version, name, _ in list_migrations():
+        print(f"{'applied' if version in done else 'pending':8} {version:03d}_{name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the database migrations in migrations/")
+    parser.add_argument("--status", action="store_true", help="list migrations and whether they are applied")
+    parser.add_argument("--reset", action="store_true", help="DROP every table first (throwaway databases only!)")
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+        return
+    if args.reset:
+        reset_schema()
+    apply_migrations()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
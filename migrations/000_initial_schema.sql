@@ -1,7 +1,4 @@
-DROP TABLE Student_Courses;
-DROP TABLE Courses;
-DROP TABLE Students;
-DROP TABLE Proctors;
+-- Initial schema (what createTables.sql created before migrations were versioned)
 
 -- Proctors Table
 CREATE TABLE IF NOT EXISTS Proctors (
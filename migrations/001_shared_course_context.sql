@@ -0,0 +1,25 @@
+-- Tables and columns for the shared course context: the context is read from Courses, and each
+-- student's conversation is kept as Conversation_Turns rows. The old per-student copies in
+-- Student_Courses.learned_context are moved into Conversation_Turns by 010_move_learned_context.sql.
+ALTER TABLE Courses ADD COLUMN IF NOT EXISTS trained_at TIMESTAMP;
+ALTER TABLE Student_Courses ADD COLUMN IF NOT EXISTS summary TEXT;
+
+CREATE TABLE IF NOT EXISTS Course_Chunks (
+    id SERIAL PRIMARY KEY,
+    course_id INTEGER REFERENCES Courses(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS Conversation_Turns (
+    id SERIAL PRIMARY KEY,
+    student_id INTEGER REFERENCES Students(id) ON DELETE CASCADE,
+    course_id INTEGER REFERENCES Courses(id) ON DELETE CASCADE,
+    role VARCHAR(16) NOT NULL,
+    content TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_conversation_turns_student_course
+    ON Conversation_Turns (student_id, course_id, id);
+
@@ -0,0 +1,18 @@
+-- Background training job queue used by /train and train/worker.py
+CREATE TABLE IF NOT EXISTS Training_Jobs (
+    id SERIAL PRIMARY KEY,
+    proctor_id INTEGER REFERENCES Proctors(id) ON DELETE CASCADE,
+    username VARCHAR(255) NOT NULL,
+    course_name VARCHAR(255) NOT NULL,
+    status VARCHAR(16) NOT NULL DEFAULT 'queued',
+    total_docs INTEGER,
+    processed_docs INTEGER DEFAULT 0,
+    current_document VARCHAR(255),
+    message TEXT,
+    created_at TIMESTAMP DEFAULT NOW(),
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_training_jobs_status ON Training_Jobs (status, id);
@@ -0,0 +1,11 @@
+-- Extraction cache used by train/read_docs.py so retraining only processes new or changed files
+CREATE TABLE IF NOT EXISTS Document_Extractions (
+    blob_name VARCHAR(1024) PRIMARY KEY,
+    folder_prefix VARCHAR(1024) NOT NULL,
+    generation VARCHAR(32),
+    md5_hash VARCHAR(64),
+    content TEXT NOT NULL,
+    extracted_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_document_extractions_folder ON Document_Extractions (folder_prefix);
@@ -0,0 +1,2 @@
+-- Per-page text records for PDFs, kept for citations
+ALTER TABLE Document_Extractions ADD COLUMN IF NOT EXISTS pages JSONB;
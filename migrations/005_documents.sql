@@ -0,0 +1,12 @@
+-- Document manifest used by /load-docs instead of listing the bucket on every request
+CREATE TABLE IF NOT EXISTS Documents (
+    id SERIAL PRIMARY KEY,
+    folder_prefix VARCHAR(1024) NOT NULL,
+    blob_name VARCHAR(1024) UNIQUE NOT NULL,
+    doc_type VARCHAR(16) NOT NULL,
+    size BIGINT,
+    generation VARCHAR(32),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_documents_folder ON Documents (folder_prefix, blob_name);
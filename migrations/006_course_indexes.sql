@@ -0,0 +1,11 @@
+-- Indexes for the course lookups on every question, enrollment and course listing.
+-- A proctor can only have one course of a given name; if this fails, rename or merge the
+-- duplicate courses it reports and run the migration again.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_courses_proctor_name ON Courses (proctor_id, name);
+CREATE INDEX IF NOT EXISTS idx_courses_name ON Courses (name);
+
+-- The primary key (student_id, course_id) covers lookups by student; this covers lookups by course
+CREATE INDEX IF NOT EXISTS idx_student_courses_course ON Student_Courses (course_id);
+
+-- Chunks are read per course in chunk order when a course's retrieval index is built
+CREATE INDEX IF NOT EXISTS idx_course_chunks_course ON Course_Chunks (course_id, chunk_index);
@@ -0,0 +1,17 @@
+-- Structured extraction output: one record per PDF page or PPTX slide of each course document,
+-- so answers can cite their sources and retraining only rewrites the pages that changed.
+-- Page 0 is a whole document without page information.
+CREATE TABLE IF NOT EXISTS Document_Records (
+    id SERIAL PRIMARY KEY,
+    course_id INTEGER REFERENCES Courses(id) ON DELETE CASCADE,
+    document VARCHAR(1024) NOT NULL,
+    page INTEGER NOT NULL DEFAULT 0,
+    section TEXT,
+    content TEXT NOT NULL,
+    content_hash VARCHAR(64) NOT NULL,
+    UNIQUE (course_id, document, page)
+);
+
+-- Each chunk points at the record it was cut from (NULL for courses trained before this migration)
+ALTER TABLE Course_Chunks ADD COLUMN IF NOT EXISTS record_id INTEGER REFERENCES Document_Records(id) ON DELETE CASCADE;
+CREATE INDEX IF NOT EXISTS idx_course_chunks_record ON Course_Chunks (record_id, chunk_index);
@@ -0,0 +1,3 @@
+-- PPTX extraction now also reads tables, grouped shapes and speaker notes; forget the cached text
+-- of slide decks so the next training run extracts them again
+DELETE FROM Document_Extractions WHERE blob_name LIKE '%.pptx';
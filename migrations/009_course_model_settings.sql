@@ -0,0 +1,6 @@
+-- Per-course model settings used by model_router.py; NULL means the server default
+-- (DEFAULT_MODEL, FAST_MODEL, DEFAULT_TEMPERATURE, DEFAULT_MAX_TOKENS)
+ALTER TABLE Courses ADD COLUMN IF NOT EXISTS model VARCHAR(64);
+ALTER TABLE Courses ADD COLUMN IF NOT EXISTS fast_model VARCHAR(64);
+ALTER TABLE Courses ADD COLUMN IF NOT EXISTS temperature REAL;
+ALTER TABLE Courses ADD COLUMN IF NOT EXISTS max_tokens INTEGER;
@@ -0,0 +1,35 @@
+-- Student_Courses.learned_context held each student's copy of the course context, with their
+-- conversation appended as "\n\nStudent: ...\n\nTutor: ..." blocks (001 used to strip the copied
+-- context from some rows). Nothing reads the column any more, so each student's old conversation
+-- is moved into Conversation_Turns and the column is dropped, along with the copied course text.
+--
+-- Turns are replayed in id order and the old turns predate every existing one, so they are given
+-- negative ids, in conversation order.
+WITH conversations AS (
+    SELECT student_id, course_id,
+           SUBSTRING(learned_context FROM POSITION(E'\n\nStudent: ' IN learned_context) + 2) AS conversation
+    FROM Student_Courses
+    WHERE POSITION(E'\n\nStudent: ' IN learned_context) > 0
+),
+messages AS (
+    SELECT c.student_id, c.course_id, m.message, m.position
+    FROM conversations c
+    CROSS JOIN LATERAL regexp_split_to_table(c.conversation, E'\n\n(?=(?:Student|Tutor): )')
+        WITH ORDINALITY AS m(message, position)
+    WHERE m.message ~ '^(Student|Tutor): '
+),
+numbered AS (
+    SELECT student_id, course_id, message,
+           ROW_NUMBER() OVER (ORDER BY student_id, course_id, position) AS n,
+           COUNT(*) OVER () AS total
+    FROM messages
+)
+INSERT INTO Conversation_Turns (id, student_id, course_id, role, content)
+SELECT n - total - 1,
+       student_id,
+       course_id,
+       CASE WHEN message LIKE 'Student: %' THEN 'user' ELSE 'assistant' END,
+       regexp_replace(message, '^(Student|Tutor): ', '')
+FROM numbered;
+
+ALTER TABLE Student_Courses DROP COLUMN IF EXISTS learned_context;
@@ -0,0 +1,13 @@
+-- Resumable upload sessions used by /upload/start and /upload/<upload_id>; kept on the server so the
+-- storage session URL never reaches the browser and concurrent uploads do not overwrite each other
+CREATE TABLE IF NOT EXISTS Upload_Sessions (
+    id VARCHAR(32) PRIMARY KEY,
+    proctor_id INTEGER REFERENCES Proctors(id) ON DELETE CASCADE,
+    folder_prefix VARCHAR(1024) NOT NULL,
+    blob_name VARCHAR(1024) NOT NULL,
+    size BIGINT NOT NULL,
+    token TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_upload_sessions_created ON Upload_Sessions (created_at);
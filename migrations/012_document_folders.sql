@@ -0,0 +1,11 @@
+-- Folders whose bucket listing has been read into the Documents manifest; /load-docs only lists the
+-- bucket for a folder that has never been synced (or on ?refresh=1)
+CREATE TABLE IF NOT EXISTS Document_Folders (
+    folder_prefix VARCHAR(1024) PRIMARY KEY,
+    synced_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Folders that already have manifest rows were synced (or filled by uploads) before this table existed
+INSERT INTO Document_Folders (folder_prefix)
+SELECT DISTINCT folder_prefix FROM Documents
+ON CONFLICT (folder_prefix) DO NOTHING;
@@ -0,0 +1,123 @@
+import os
+import re
+
+from metrics import count
+
+# Model routing settings: the model for most questions, a cheaper/faster model for simple ones,
+# and the default sampling settings (each can be overridden per course on the Courses table)
+MODEL_ROUTING_ENABLED = os.environ.get("MODEL_ROUTING_ENABLED", "1") == "1"
+DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "gpt-4o")
+FAST_MODEL = os.environ.get("FAST_MODEL", "gpt-4o-mini")
+DEFAULT_TEMPERATURE = float(os.environ.get("DEFAULT_TEMPERATURE", 0.7))
+DEFAULT_MAX_TOKENS = int(os.environ.get("DEFAULT_MAX_TOKENS", 500))
+FAST_MAX_TOKENS = int(os.environ.get("FAST_MAX_TOKENS", 300))
+
+# Questions longer than this many words are never treated as simple
+SIMPLE_MAX_WORDS = int(os.environ.get("SIMPLE_MAX_WORDS", 15))
+
+# Models a proctor may pick for a course (comma separated)
+ALLOWED_MODELS = [
+    model.strip()
+    for model in os.environ.get("ALLOWED_MODELS", "gpt-4o,gpt-4o-mini,gpt-4.1,gpt-4.1-mini").split(",")
+    if model.strip()
+]
+
+# Openings of look-up style questions: a definition, a name, a date, a formula
+SIMPLE_PATTERN = re.compile(
+    r"^(what\s+(is|are|was|were|does)|what's|whats|define|definition\s+of|who\s+(is|was|are|were)|"
+    r"when\s+(is|was|did|does)|where\s+(is|are|was|can)|which\s+\w+\s+(is|are)|is\s+there|"
+    r"what\s+do\s+(we|you)\s+call|what\s+does\s+.+\s+(mean|stand\s+for)|meaning\s+of)\b"
+)
+
+# Words that ask for reasoning, working or comparison rather than a fact
+COMPLEX_PATTERN = re.compile(
+    r"\b(why|how|explain|compare|contrast|difference|differences|prove|proof|derive|derivation|solve|"
+    r"calculate|compute|step|steps|analy[sz]e|evaluate|example|examples|relationship|implications?|"
+    r"debug|error|wrong|instead|versus|vs)\b"
+)
+
+# Code, maths or a pasted problem
+TECHNICAL_PATTERN = re.compile(r"```|[=<>^{}\[\]\\]|\d+\s*[-+*/]\s*\d+|\bdef\b|\bfunction\b|;\s*$", re.MULTILINE)
+
+
+# Function to classify a question as "simple" or "complex" without an API call
+def classify_question(question):
+    """
+    A question is simple when it is short, a single sentence, opens like a look-up ("What is ...",
+    "Define ...", "Who was ...") and asks for no reasoning, working, code or maths. Everything
+    else is complex, so a misclassification only ever costs a more expensive model.
+    """
+    text = " ".join(question.lower().split())
+    if not text or len(text.split()) > SIMPLE_MAX_WORDS:
+        return "complex"
+    if text.count("?") > 1 or len(re.findall(r"[.!?]\s+\w", text)) > 0:
+        return "complex"  # several questions or sentences
+    if TECHNICAL_PATTERN.search(question) or COMPLEX_PATTERN.search(text):
+        return "complex"
+    return "simple" if SIMPLE_PATTERN.match(text) else "complex"
+
+# Function to pick the model call settings for a question
+def route_question(settings, question, stream=False):
+    """
+    Args:
+        settings (dict): The course's {"model", "fast_model", "temperature", "max_tokens"}; None
+            values fall back to the defaults above.
+        question (str): The student's question.
+        stream (bool): The answer is streamed to the student, so it cannot be asked again of the
+            main model; the fast model then gets the course's full max_tokens instead.
+
+    Returns:
+        dict: {"tier", "model", "temperature", "max_tokens", "escalation"}. When the question went
+            to the fast model, "escalation" is the route to the course's main model (for answers
+            the fast model could not finish); otherwise it is None.
+    """
+    model = settings.get("model") or DEFAULT_MODEL
+    fast_model = settings.get("fast_model") or FAST_MODEL
+    temperature = settings["temperature"] if settings.get("temperature") is not None else DEFAULT_TEMPERATURE
+    max_tokens = settings.get("max_tokens") or DEFAULT_MAX_TOKENS
+
+    main = {"tier": "complex", "model": model, "temperature": temperature, "max_tokens": max_tokens, "escalation": None}
+    tier = classify_question(question) if MODEL_ROUTING_ENABLED and fast_model != model else "complex"
+    count("tutor_model_route_total", help="Questions routed to each model tier", tier=tier)
+    if tier == "simple" and stream:
+        return {"tier": tier, "model": fast_model, "temperature": temperature, "max_tokens": max_tokens, "escalation": None}
+    if tier == "simple":
+        return {
+            "tier": tier,
+            "model": fast_model,
+            "temperature": temperature,
+            "max_tokens": min(max_tokens, FAST_MAX_TOKENS),
+            "escalation": main,
+        }
+    return main
+
+# Function to check the model settings a proctor submitted for a course; returns the cleaned
+# settings, or raises ValueError naming the bad field. Empty values reset a field to the default.
+def validate_course_settings(data):
+    settings = {}
+    for field in ("model", "fast_model"):
+        value = (data.get(field) or "").strip() or None
+        if value is not None and value not in ALLOWED_MODELS:
+            raise ValueError(f"{field} must be one of: {', '.join(ALLOWED_MODELS)}")
+        settings[field] = value
+    temperature = data.get("temperature")
+    if temperature in (None, ""):
+        settings["temperature"] = None
+    else:
+        try:
+            settings["temperature"] = float(temperature)
+        except (TypeError, ValueError):
+            raise ValueError("temperature must be a number")
+        if not 0 <= settings["temperature"] <= 2:
+            raise ValueError("temperature must be between 0 and 2")
+    max_tokens = data.get("max_tokens")
+    if max_tokens in (None, ""):
+        settings["max_tokens"] = None
+    else:
+        try:
+            settings["max_tokens"] = int(max_tokens)
+        except (TypeError, ValueError):
+            raise ValueError("max_tokens must be a whole number")
+        if not 1 <= settings["max_tokens"] <= 4096:
+            raise ValueError("max_tokens must be between 1 and 4096")
+    return settings
@@ -0,0 +1,271 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from metrics import count, observe
+
+# Rate limit settings: questions per minute (and burst size) allowed per student and per course
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1") == "1"
+STUDENT_RATE_PER_MINUTE = float(os.environ.get("STUDENT_RATE_PER_MINUTE", 6))
+STUDENT_BURST = int(os.environ.get("STUDENT_BURST", 3))
+COURSE_RATE_PER_MINUTE = float(os.environ.get("COURSE_RATE_PER_MINUTE", 300))
+COURSE_BURST = int(os.environ.get("COURSE_BURST", 60))
+
+# Outbound model call settings: calls in flight per process, seconds a question may wait for a slot,
+# and retries (with exponential backoff and jitter) when OpenAI answers 429
+MODEL_MAX_CONCURRENCY = int(os.environ.get("MODEL_MAX_CONCURRENCY", 16))
+MODEL_QUEUE_TIMEOUT = float(os.environ.get("MODEL_QUEUE_TIMEOUT", 30))
+MODEL_QUEUE_WORKERS = int(os.environ.get("MODEL_QUEUE_WORKERS", 64))  # threads that wait for a slot for async callers
+MODEL_MAX_RETRIES = int(os.environ.get("MODEL_MAX_RETRIES", 4))
+MODEL_RETRY_BASE = float(os.environ.get("MODEL_RETRY_BASE", 0.5))
+MODEL_RETRY_MAX = float(os.environ.get("MODEL_RETRY_MAX", 20))
+
+# Share one API call between students asking the same question of the same course at the same time
+COALESCE_QUESTIONS = os.environ.get("COALESCE_QUESTIONS", "1") == "1"
+
+
+class RateLimited(Exception):
+    """
+    Raised when a question is refused or could not get a model slot in time; the routes
+    answer 429 with a Retry-After header.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after + 0.999))
+
+
+class TokenBucket:
+    """
+    Refills `rate` tokens per second up to `burst`; each question takes one token.
+    """
+
+    def __init__(self, rate, burst, now=None):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        # Callers may pass a `now` taken just before another thread refilled the bucket
+        self.tokens = min(self.burst, self.tokens + max(now - self.updated, 0) * self.rate)
+        self.updated = max(now, self.updated)
+
+    # Returns 0 if a token was taken, otherwise the seconds until one is available
+    def take(self, now):
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate if self.rate else float("inf")
+
+    def refund(self):
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst
+
+
+class RateLimiter:
+    """
+    Token buckets keyed on student and on course. A question must get a token from both.
+    """
+
+    def __init__(self, student_rate=STUDENT_RATE_PER_MINUTE, student_burst=STUDENT_BURST,
+                 course_rate=COURSE_RATE_PER_MINUTE, course_burst=COURSE_BURST, max_buckets=10000):
+        self.limits = {
+            "student": (student_rate / 60, student_burst),
+            "course": (course_rate / 60, course_burst),
+        }
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+        self.buckets = {}  # (scope, id) -> TokenBucket
+
+    def _bucket(self, scope, key, now):
+        bucket = self.buckets.get((scope, key))
+        if bucket is None:
+            if len(self.buckets) >= self.max_buckets:
+                # Forget buckets that have refilled; they behave the same as new ones
+                for idle in [k for k, b in self.buckets.items() if b.is_full(now)]:
+                    del self.buckets[idle]
+            rate, burst = self.limits[scope]
+            bucket = self.buckets[(scope, key)] = TokenBucket(rate, burst, now)
+        return bucket
+
+    def check(self, student_id, course_id):
+        if not RATE_LIMIT_ENABLED:
+            return
+        now = time.monotonic()
+        with self.lock:
+            student = self._bucket("student", student_id, now)
+            wait = student.take(now)
+            if wait:
+                count("tutor_rate_limited_total", help="Questions refused by the rate limiter", scope="student")
+                raise RateLimited("You are asking questions too quickly. Please wait a moment and try again.", wait)
+            wait = self._bucket("course", course_id, now).take(now)
+            if wait:
+                student.refund()
+                count("tutor_rate_limited_total", help="Questions refused by the rate limiter", scope="course")
+                raise RateLimited("The tutor is busy with this course right now. Please try again shortly.", wait)
+
+
+class ModelGate:
+    """
+    Caps the model calls in flight per process. Callers over the cap queue for up to
+    MODEL_QUEUE_TIMEOUT seconds and are then refused with RateLimited.
+
+    Threaded callers (the Flask routes) and asyncio callers (asgi.py) take their slots from
+    the same semaphore, so together they never run more than max_concurrency calls. An async
+    caller that has to queue waits on a MODEL_QUEUE_WORKERS thread, not on the event loop.
+    """
+
+    def __init__(self, max_concurrency=MODEL_MAX_CONCURRENCY, queue_timeout=MODEL_QUEUE_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.waiters = None  # thread pool for queued async callers, created on first use
+
+    @contextmanager
+    def slot(self):
+        started = time.perf_counter()
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            count("tutor_rate_limited_total", help="Questions refused by the rate limiter", scope="queue")
+            raise RateLimited("The tutor is busy right now. Please try again shortly.", self.queue_timeout)
+        observe("tutor_model_queue_seconds", time.perf_counter() - started, help="Time waiting for a model call slot")
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    # Function to wait for a slot on a waiter thread until the deadline (a time.monotonic() value)
+    def _acquire_by(self, deadline):
+        return self.slots.acquire(timeout=max(deadline - time.monotonic(), 0))
+
+    # Function to give back a slot that was acquired after its async caller went away
+    def _release_if_acquired(self, future):
+        if not future.cancelled() and future.exception() is None and future.result():
+            self.slots.release()
+
+    @asynccontextmanager
+    async def async_slot(self):
+        started = time.perf_counter()
+        acquired = self.slots.acquire(blocking=False)
+        if not acquired:
+            if self.waiters is None:
+                self.waiters = ThreadPoolExecutor(max_workers=MODEL_QUEUE_WORKERS, thread_name_prefix="tutor-gate")
+            waiting = asyncio.get_running_loop().run_in_executor(
+                self.waiters, self._acquire_by, time.monotonic() + self.queue_timeout
+            )
+            try:
+                acquired = await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                waiting.add_done_callback(self._release_if_acquired)  # the caller disconnected while queued
+                raise
+        if not acquired:
+            count("tutor_rate_limited_total", help="Questions refused by the rate limiter", scope="queue")
+            raise RateLimited("The tutor is busy right now. Please try again shortly.", self.queue_timeout)
+        observe("tutor_model_queue_seconds", time.perf_counter() - started, help="Time waiting for a model call slot")
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+
+# Function to pick the wait before retry number `attempt` (honours OpenAI's Retry-After when sent)
+def retry_delay(attempt, error):
+    response = getattr(error, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), MODEL_RETRY_MAX)
+    except ValueError:
+        pass
+    return random.uniform(0, min(MODEL_RETRY_MAX, MODEL_RETRY_BASE * 2 ** attempt))  # full jitter
+
+# Function to make a model call, retrying on 429 responses
+def call_with_retry(func, *args, **kwargs):
+    for attempt in range(MODEL_MAX_RETRIES + 1):
+        try:
+            return func(*args, **kwargs)
+        except openai.RateLimitError as e:
+            if attempt == MODEL_MAX_RETRIES:
+                raise RateLimited("The tutor is busy right now. Please try again shortly.", retry_delay(attempt, e)) from e
+            count("tutor_model_retries_total", help="Model calls retried after a 429")
+            time.sleep(retry_delay(attempt, e))
+
+async def call_with_retry_async(func, *args, **kwargs):
+    for attempt in range(MODEL_MAX_RETRIES + 1):
+        try:
+            return await func(*args, **kwargs)
+        except openai.RateLimitError as e:
+            if attempt == MODEL_MAX_RETRIES:
+                raise RateLimited("The tutor is busy right now. Please try again shortly.", retry_delay(attempt, e)) from e
+            count("tutor_model_retries_total", help="Model calls retried after a 429")
+            await asyncio.sleep(retry_delay(attempt, e))
+
+
+class Coalescer:
+    """
+    Runs one call per key at a time; callers arriving while it is in flight wait for
+    and share its result (or its exception).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = {}  # key -> [Event, result, error]
+        self.async_in_flight = {}  # key -> asyncio.Future
+
+    def run(self, key, func, *args):
+        with self.lock:
+            call = self.in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self.in_flight[key] = [threading.Event(), None, None]
+        if not leader:
+            count("tutor_coalesced_total", help="Questions answered by another student's in-flight call")
+            call[0].wait()
+            if call[2] is not None:
+                raise call[2]
+            return call[1]
+        try:
+            call[1] = func(*args)
+            return call[1]
+        except Exception as e:
+            call[2] = e
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            call[0].set()
+
+    async def run_async(self, key, func, *args):
+        future = self.async_in_flight.get(key)
+        if future is not None:
+            count("tutor_coalesced_total", help="Questions answered by another student's in-flight call")
+            return await asyncio.shield(future)
+        future = self.async_in_flight[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await func(*args)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self.async_in_flight[key]
+
+
+# Shared limiter, model gate and coalescer for this process
+rate_limiter = RateLimiter()
+model_gate = ModelGate()
+coalescer = Coalescer()
@@ -0,0 +1,98 @@
+import os
+import re
+import math
+from collections import Counter
+
+# Chunking / retrieval settings (words per chunk, overlap between chunks, chunks sent per question)
+CHUNK_WORDS = int(os.environ.get("CHUNK_WORDS", 200))
+CHUNK_OVERLAP = int(os.environ.get("CHUNK_OVERLAP", 40))
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", 5))
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Very common words that carry no meaning for matching a question to the notes
+STOP_WORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "is", "are", "was", "were",
+    "be", "it", "this", "that", "with", "as", "at", "by", "from", "what", "how", "why", "do",
+    "does", "i", "you", "can", "me", "my", "we", "if", "so", "not", "but",
+}
+
+# Split text into lowercase word tokens for indexing
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+# Function to split the course notes into overlapping word windows
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """
+    Splits a document into overlapping chunks of roughly `chunk_words` words.
+
+    Args:
+        text (str): The text to split.
+        chunk_words (int): Number of words per chunk.
+        overlap (int): Number of words shared between neighbouring chunks.
+
+    Returns:
+        list[str]: The chunks, in document order.
+    """
+    words = text.split()
+    if not words:
+        return []
+    step = max(chunk_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+class BM25Index:
+    """
+    Small in-memory BM25 index over a list of text chunks (CPU only, no external dependencies).
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        doc_freqs = Counter()
+        for tf in self.term_freqs:
+            doc_freqs.update(tf.keys())
+        n = len(chunks)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in doc_freqs.items()
+        }
+
+    def score(self, query_terms, index):
+        tf = self.term_freqs[index]
+        length_norm = 1 - self.b + self.b * (self.lengths[index] / self.avg_length if self.avg_length else 0)
+        total = 0.0
+        for term in query_terms:
+            freq = tf.get(term)
+            if not freq:
+                continue
+            total += self.idf[term] * freq * (self.k1 + 1) / (freq + self.k1 * length_norm)
+        return total
+
+    def rank(self, query, top_k=RETRIEVAL_TOP_K):
+        """
+        Returns the positions of up to `top_k` chunks most relevant to the query, best match first.
+        """
+        query_terms = set(tokenize(query))
+        if not query_terms or not self.chunks:
+            return []
+        scored = [(self.score(query_terms, i), i) for i in range(len(self.chunks))]
+        scored = [item for item in scored if item[0] > 0]
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [i for _, i in scored[:top_k]]
+
+    def search(self, query, top_k=RETRIEVAL_TOP_K):
+        """
+        Returns up to `top_k` chunks most relevant to the query, best match first.
+        """
+        return [self.chunks[i] for i in self.rank(query, top_k)]
@@ -0,0 +1,123 @@
+import io
+import csv
+import json
+import os
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from identity_cache import invalidate_student
+
+# Largest roster accepted in one upload
+ROSTER_MAX_ROWS = int(os.environ.get("ROSTER_MAX_ROWS", 5000))
+
+# Column names recognised as the username column of a CSV roster
+USERNAME_COLUMNS = {"username", "user", "student", "student_username", "login"}
+
+
+class RosterError(ValueError):
+    """
+    Raised when a roster cannot be read at all (as opposed to individual bad rows).
+    """
+
+
+# Function to read the usernames from a CSV roster (a "username" column, or else the first column)
+def parse_roster_csv(data):
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return []
+    header = [cell.strip().lower() for cell in rows[0]]
+    column = next((i for i, name in enumerate(header) if name in USERNAME_COLUMNS), None)
+    if column is None:
+        column, start = 0, 0  # no header row
+    else:
+        start = 1
+    return [row[column].strip() if len(row) > column else "" for row in rows[start:] if any(cell.strip() for cell in row)]
+
+# Function to read the usernames from a JSON roster: a list of usernames or of {"username": ...} objects
+def parse_roster_json(data):
+    if isinstance(data, (bytes, str)):
+        try:
+            data = json.loads(data)
+        except ValueError as e:
+            raise RosterError(f"Invalid JSON roster: {e}")
+    if isinstance(data, dict):
+        data = data.get("usernames", data.get("students"))
+    if not isinstance(data, list):
+        raise RosterError("The roster must be a list of usernames.")
+    return [
+        (item.get("username") if isinstance(item, dict) else item) or ""
+        for item in data
+    ]
+
+# Function to enroll a list of students in one of the proctor's courses in a single transaction
+def enroll_students(proctor_id, course_name, usernames):
+    """
+    Resolves every username in one query and inserts the enrollments with one batched INSERT.
+
+    Args:
+        proctor_id (int): The proctor who owns the course.
+        course_name (str): The course name.
+        usernames (list[str]): Usernames in roster order.
+
+    Returns:
+        list[dict]: One {"row", "username", "status"} result per roster row (rows start at 1).
+            status is "enrolled", "already_enrolled", "not_found", "duplicate" or "invalid".
+
+    Raises:
+        RosterError: If the roster is too large or the course does not exist.
+    """
+    if len(usernames) > ROSTER_MAX_ROWS:
+        raise RosterError(f"Rosters are limited to {ROSTER_MAX_ROWS} students.")
+
+    results = []
+    seen = set()
+    for row, username in enumerate(usernames, start=1):
+        username = str(username).strip()
+        if not username or len(username) > 255:
+            status = "invalid"
+        elif username in seen:
+            status = "duplicate"
+        else:
+            status = None
+            seen.add(username)
+        results.append({"row": row, "username": username, "status": status})
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM Courses WHERE name = %s AND proctor_id = %s", (course_name, proctor_id))
+            course_row = cursor.fetchone()
+            if not course_row:
+                raise RosterError("Course not found.")
+            course_id = course_row[0]
+
+            cursor.execute("SELECT username, id FROM Students WHERE username = ANY(%s)", (list(seen),))
+            student_ids = dict(cursor.fetchall())
+
+            new_ids = set()
+            if student_ids:
+                inserted = execute_values(
+                    cursor,
+                    """
+                    INSERT INTO Student_Courses (student_id, course_id) VALUES %s
+                    ON CONFLICT (student_id, course_id) DO NOTHING
+                    RETURNING student_id
+                    """,
+                    [(student_id, course_id) for student_id in student_ids.values()],
+                    page_size=1000,
+                    fetch=True
+                )
+                new_ids = {row[0] for row in inserted}
+
+    for student_id in new_ids:
+        invalidate_student(student_id)
+
+    for result in results:
+        if result["status"] is None:
+            student_id = student_ids.get(result["username"])
+            if student_id is None:
+                result["status"] = "not_found"
+            else:
+                result["status"] = "enrolled" if student_id in new_ids else "already_enrolled"
+    return results
@@ -48,8 +48,18 @@ function handleFiles(event) {
     }
 }
 
+// Files larger than this are sent as resumable chunked uploads
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+
 // Save file to the appropriate course's folder
 function saveFileToDocsFolder(file, course) {
+    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        uploadFileInChunks(file, course)
+            .then(() => console.log(`${file.name} saved to ${course} folder.`))
+            .catch(err => console.error(`Error saving ${file.name}:`, err));
+        return;
+    }
+
     const formData = new FormData();
     formData.append("file", file);
     formData.append("course", course); // course name
@@ -69,6 +79,48 @@ function saveFileToDocsFolder(file, course) {
     .catch(err => console.error('Error saving file:', err));
 }
 
+// Upload a large file chunk by chunk, resuming from the server's offset if a chunk fails
+async function uploadFileInChunks(file, course, maxRetries = 3) {
+    const start = await fetch("/upload/start", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ course: course, filename: file.name, size: file.size })
+    }).then(response => response.json());
+    if (!start.success) {
+        throw new Error(start.message);
+    }
+
+    let offset = start.offset;
+    let retries = 0;
+    while (offset < file.size) {
+        const chunk = file.slice(offset, offset + start.chunk_size);
+        try {
+            const data = await fetch(`/upload/${start.upload_id}?offset=${offset}`, {
+                method: "PUT",
+                body: chunk
+            }).then(response => response.json());
+            if (!data.success) {
+                throw new Error(data.message);
+            }
+            if (data.done) {
+                return;
+            }
+            offset = data.offset;
+            retries = 0;
+        } catch (err) {
+            if (++retries > maxRetries) {
+                throw err;
+            }
+            // Ask the server how much was stored and continue from there
+            const status = await fetch(`/upload/${start.upload_id}`).then(response => response.json());
+            if (status.done) {
+                return;
+            }
+            offset = status.offset;
+        }
+    }
+}
+
 // Display file preview based on file type
 function displayFilePreview(fileName, fileType, isTrained) {
     const preview = document.createElement('div');
@@ -148,8 +200,8 @@ trainButton.addEventListener('click', () => {
     .then(response => response.json())
     .then(data => {
         if (data.success) {
-            console.log("Model trained successfully.");
-            updateTrainedFiles();
+            console.log(`Training job ${data.job_id} queued.`);
+            pollTrainingStatus(data.job_id);
         } else {
             console.error(`Error training model: ${data.message}`);
         }
@@ -157,6 +209,31 @@ trainButton.addEventListener('click', () => {
     .catch(err => console.error('Error training model:', err));
 });
 
+// Poll the training job until it finishes
+function pollTrainingStatus(jobId) {
+    fetch(`/train-status/${jobId}`)
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                console.error(`Error checking training status: ${data.message}`);
+                return;
+            }
+            const job = data.job;
+            if (job.status === 'succeeded') {
+                console.log("Model trained successfully.");
+                updateTrainedFiles();
+            } else if (job.status === 'failed') {
+                console.error(`Error training model: ${job.message}`);
+            } else {
+                if (job.total_docs) {
+                    console.log(`Training: ${job.processed_docs}/${job.total_docs} documents (${job.current_document || 'finishing'})`);
+                }
+                setTimeout(() => pollTrainingStatus(jobId), 2000);
+            }
+        })
+        .catch(err => console.error('Error checking training status:', err));
+}
+
 // Update preview after training to mark files as trained
 function updateTrainedFiles() {
     const previews = document.querySelectorAll('.file-preview');
@@ -199,6 +276,44 @@ document.getElementById('assign-student-btn').addEventListener('click', () => {
     });
 });
 
+// Enroll every student in a CSV/JSON roster file in one request
+document.getElementById('import-roster-btn').addEventListener('click', () => {
+    const rosterFile = document.getElementById('roster-input').files[0];
+    const coursesDropdown = document.getElementById('courses-dropdown');
+    const selectedCourseName = coursesDropdown.selectedOptions[0].text;
+
+    if (!rosterFile) {
+        alert("Please choose a roster file.");
+        return;
+    }
+
+    const formData = new FormData();
+    formData.append('file', rosterFile);
+    formData.append('course_name', selectedCourseName);
+
+    fetch('/assign-students', {
+        method: 'POST',
+        body: formData
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            let message = `${data.enrolled} students enrolled in "${selectedCourseName}", ${data.already_enrolled} already enrolled.`;
+            if (data.failed.length) {
+                message += `\n\n${data.failed.length} rows could not be enrolled:\n` +
+                    data.failed.map(row => `Row ${row.row} (${row.username || 'blank'}): ${row.status.replace('_', ' ')}`).join('\n');
+            }
+            alert(message);
+        } else {
+            alert(`Error: ${data.message}`);
+        }
+    })
+    .catch(err => {
+        console.error('Error importing roster:', err);
+        alert('An error occurred while importing the roster.');
+    });
+});
+
 // Function to load existing files in the docs folder
 function loadExistingFiles() {
     fetch("/load-docs")
@@ -42,7 +42,9 @@ document.getElementById('submit-question').addEventListener('click', function ()
     const coursesDropdown = document.getElementById('courses-dropdown');
     const selectedCourseName = coursesDropdown.selectedOptions[0].text;
 
-    fetch('/ask-question', {
+    // Stream the answer so it appears as the tutor writes it
+    const responseParagraph = updateConversation("");
+    fetch('/ask-question-stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -52,25 +54,61 @@ document.getElementById('submit-question').addEventListener('click', function ()
             courseName: selectedCourseName,
         }),
     })
-        .then(response => response.json())
-        .then(data => {
-            if (data.success) {
-                updateConversation(data.response);
-            } else {
+        .then(response => readEventStream(response, (event, data) => {
+            if (event === 'error') {
                 console.error("Error in response:", data.message);
+                if (data.retry_after) {
+                    responseParagraph.textContent = data.message;  // rate limited: tell the student to wait
+                }
+            } else if (event === 'done' && data.citations && data.citations.length) {
+                // Name the course pages the answer was based on
+                const sources = document.createElement('small');
+                sources.className = 'citations';
+                sources.textContent = "Sources: " + data.citations.map(citation => citation.label).join("; ");
+                responseParagraph.appendChild(document.createElement('br'));
+                responseParagraph.appendChild(sources);
+            } else if (data.delta) {
+                responseParagraph.textContent += data.delta;
+                const conversationDiv = document.getElementById('conversation');
+                conversationDiv.scrollTop = conversationDiv.scrollHeight;
             }
-        })
+        }))
         .catch(err => {
             console.error("Error:", err);
         });
 });
 
+// Read a Server-Sent Events response body, calling onEvent(event, data) for each message
+async function readEventStream(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const message = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            let event = "message";
+            let data = "";
+            message.split("\n").forEach(line => {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            });
+            if (data) onEvent(event, JSON.parse(data));
+        }
+    }
+}
+
 function updateConversation(tutorResponse) {
     const conversationDiv = document.getElementById('conversation');
     const newMessage = document.createElement('p');
     newMessage.textContent = tutorResponse;
     conversationDiv.appendChild(newMessage);
     conversationDiv.scrollTop = conversationDiv.scrollHeight;
+    return newMessage;
 }
 
 
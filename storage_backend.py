@@ -0,0 +1,290 @@
+import os
+import io
+import json
+import shutil
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timezone
+
+# Storage settings: which backend to use ("gcs", "local" or "memory"), the GCS bucket,
+# and the root directory of the local backend
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "gcs")
+STORAGE_BUCKET = os.environ.get("STORAGE_BUCKET", "ai-tutor-docs")
+STORAGE_LOCAL_ROOT = os.environ.get("STORAGE_LOCAL_ROOT", "local_storage")
+
+# Credentials used by the deployed app when GOOGLE_APPLICATION_CREDENTIALS is not set
+DEFAULT_GCS_CREDENTIALS = "/workspace/gcloud_keys/ds400-capstone-7c0083efd90a.json"
+
+
+class StoredObject:
+    """
+    Metadata about one stored file (the parts of a GCS blob the app uses).
+    """
+
+    def __init__(self, name, size, generation=None, md5_hash=None, updated=None, etag=None):
+        self.name = name
+        self.size = size
+        self.generation = generation
+        self.md5_hash = md5_hash
+        self.updated = updated
+        self.etag = etag or (md5_hash or f"{generation}-{size}")
+
+
+class GCSStorage:
+    """
+    Google Cloud Storage backend. The client is only built the first time it is used.
+    """
+
+    def __init__(self, bucket_name=STORAGE_BUCKET):
+        self.bucket_name = bucket_name
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def bucket(self):
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    from google.cloud import storage  # Google Cloud Storage library
+
+                    if not os.environ.get("GOOGLE_APPLICATION_CREDENTIALS") and os.path.exists(DEFAULT_GCS_CREDENTIALS):
+                        os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = DEFAULT_GCS_CREDENTIALS
+                    self._bucket = storage.Client().bucket(self.bucket_name)
+        return self._bucket
+
+    @staticmethod
+    def _info(blob):
+        return StoredObject(
+            blob.name, blob.size, str(blob.generation) if blob.generation else None,
+            blob.md5_hash, blob.updated, blob.etag.strip('"') if blob.etag else None
+        )
+
+    def list(self, prefix):
+        return [self._info(blob) for blob in self.bucket.list_blobs(prefix=prefix)]
+
+    def stat(self, name):
+        blob = self.bucket.get_blob(name)
+        return self._info(blob) if blob else None
+
+    def exists(self, name):
+        return self.bucket.blob(name).exists()
+
+    def get(self, name):
+        return self.bucket.blob(name).download_as_bytes()
+
+    def open(self, name, chunk_size=256 * 1024):
+        return self.bucket.blob(name).open('rb', chunk_size=chunk_size)
+
+    def put(self, name, data, content_type=None, chunk_size=8 * 1024 * 1024):
+        blob = self.bucket.blob(name, chunk_size=chunk_size)  # stream to GCS chunk by chunk
+        if isinstance(data, (bytes, str)):
+            blob.upload_from_string(data, content_type=content_type)
+        else:
+            blob.upload_from_file(data, content_type=content_type)
+        return self._info(blob)
+
+    def delete(self, name):
+        self.bucket.blob(name).delete()
+
+    # Resumable uploads: the token is the GCS session URL
+    def start_upload(self, name, size, content_type=None):
+        return self.bucket.blob(name).create_resumable_upload_session(content_type=content_type, size=size)
+
+    def upload_chunk(self, token, size, offset=None, stream=None, length=None):
+        """
+        Sends one chunk (or, with no stream, just asks for the stored offset).
+        Returns (next offset, StoredObject once the upload is complete, else None).
+        """
+        import requests
+
+        if stream is None:
+            response = requests.put(token, headers={'Content-Range': f"bytes */{size}"})
+        else:
+            response = requests.put(token, data=stream, headers={
+                'Content-Length': str(length),
+                'Content-Range': f"bytes {offset}-{offset + length - 1}/{size}",
+            })
+        if response.status_code in (200, 201):
+            blob = response.json()
+            return size, StoredObject(blob['name'], int(blob['size']), blob.get('generation'),
+                                      blob.get('md5Hash'), None, blob.get('etag'))
+        if response.status_code == 308:
+            uploaded = response.headers.get('Range')  # e.g. "bytes=0-8388607"
+            return (int(uploaded.split('-')[1]) + 1 if uploaded else 0), None
+        raise IOError(f"Upload failed: {response.status_code}")
+
+
+class LocalStorage:
+    """
+    Stores files under a directory on disk, for running and load-testing without GCS.
+    """
+
+    def __init__(self, root=STORAGE_LOCAL_ROOT):
+        self.root = os.path.abspath(root)
+        self.uploads = os.path.join(self.root, ".uploads")
+
+    def _path(self, name):
+        path = os.path.abspath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep) and path != self.root:
+            raise ValueError(f"Invalid object name: {name}")
+        return path
+
+    def _info(self, name, path):
+        st = os.stat(path)
+        return StoredObject(name, st.st_size, str(st.st_mtime_ns), None,
+                            datetime.fromtimestamp(st.st_mtime, tz=timezone.utc))
+
+    def list(self, prefix):
+        results = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d != ".uploads"]
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, "/")
+                if name.startswith(prefix):
+                    results.append(self._info(name, path))
+        return sorted(results, key=lambda obj: obj.name)
+
+    def stat(self, name):
+        path = self._path(name)
+        return self._info(name, path) if os.path.isfile(path) else None
+
+    def exists(self, name):
+        path = self._path(name)
+        return os.path.isfile(path) or (name.endswith("/") and os.path.isdir(path))
+
+    def get(self, name):
+        with open(self._path(name), "rb") as f:
+            return f.read()
+
+    def open(self, name, chunk_size=None):
+        return open(self._path(name), "rb")
+
+    def put(self, name, data, content_type=None, chunk_size=None):
+        path = self._path(name)
+        if name.endswith("/"):  # folder marker
+            os.makedirs(path, exist_ok=True)
+            return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            if isinstance(data, (bytes, str)):
+                f.write(data.encode() if isinstance(data, str) else data)
+            else:
+                shutil.copyfileobj(data, f)
+        os.replace(tmp_path, path)
+        return self._info(name, path)
+
+    def delete(self, name):
+        os.remove(self._path(name))
+
+    def start_upload(self, name, size, content_type=None):
+        os.makedirs(self.uploads, exist_ok=True)
+        token = uuid.uuid4().hex
+        with open(os.path.join(self.uploads, token + ".json"), "w") as f:
+            json.dump({"name": name, "size": size}, f)
+        open(os.path.join(self.uploads, token), "wb").close()
+        return token
+
+    def upload_chunk(self, token, size, offset=None, stream=None, length=None):
+        part_path = os.path.join(self.uploads, os.path.basename(token))
+        with open(part_path + ".json") as f:
+            name = json.load(f)["name"]
+        stored = os.path.getsize(part_path)
+        if stream is not None:
+            if offset != stored:
+                return stored, None  # the client resumes from the stored offset
+            with open(part_path, "ab") as f:
+                shutil.copyfileobj(stream, f, 1024 * 1024)
+            stored = os.path.getsize(part_path)
+        if stored < size:
+            return stored, None
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(part_path, path)
+        os.remove(part_path + ".json")
+        return size, self._info(name, path)
+
+
+class MemoryStorage:
+    """
+    Keeps files in a dict, for tests and benchmarks in a single process.
+    """
+
+    def __init__(self):
+        self.objects = {}  # name -> (bytes, StoredObject)
+        self.uploads = {}  # token -> [name, bytearray]
+        self.lock = threading.Lock()
+        self.generation = 0
+
+    def _store(self, name, data):
+        with self.lock:
+            self.generation += 1
+            info = StoredObject(name, len(data), str(self.generation), hashlib.md5(data).hexdigest(),
+                                datetime.now(timezone.utc))
+            self.objects[name] = (bytes(data), info)
+        return info
+
+    def list(self, prefix):
+        with self.lock:
+            return [info for name, (_, info) in sorted(self.objects.items()) if name.startswith(prefix)]
+
+    def stat(self, name):
+        entry = self.objects.get(name)
+        return entry[1] if entry else None
+
+    def exists(self, name):
+        return name in self.objects
+
+    def get(self, name):
+        return self.objects[name][0]
+
+    def open(self, name, chunk_size=None):
+        return io.BytesIO(self.objects[name][0])
+
+    def put(self, name, data, content_type=None, chunk_size=None):
+        if not isinstance(data, (bytes, str)):
+            data = data.read()
+        return self._store(name, data.encode() if isinstance(data, str) else data)
+
+    def delete(self, name):
+        with self.lock:
+            del self.objects[name]
+
+    def start_upload(self, name, size, content_type=None):
+        token = uuid.uuid4().hex
+        self.uploads[token] = [name, bytearray()]
+        return token
+
+    def upload_chunk(self, token, size, offset=None, stream=None, length=None):
+        name, buffer = self.uploads[token]
+        if stream is not None and offset == len(buffer):
+            buffer.extend(stream.read())
+        if len(buffer) < size:
+            return len(buffer), None
+        del self.uploads[token]
+        return size, self._store(name, buffer)
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+# Function to get the configured storage backend (created on first use, not at import)
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                if STORAGE_BACKEND == "local":
+                    _storage = LocalStorage()
+                elif STORAGE_BACKEND == "memory":
+                    _storage = MemoryStorage()
+                else:
+                    _storage = GCSStorage()
+    return _storage
+
+# Function to replace the storage backend (used by tests and benchmarks)
+def set_storage(storage):
+    global _storage
+    _storage = storage
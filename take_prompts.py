@@ -1,8 +1,20 @@
 import os
+import time
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import openai
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import DictCursor
+from db import get_db_connection, DB_POOL_MAX
+from retrieval import BM25Index, RETRIEVAL_TOP_K
+from answer_cache import answer_cache, normalize_question, refers_to_history, ANSWER_CACHE_ENABLED
+from rate_limit import (RateLimited, rate_limiter, model_gate, coalescer, call_with_retry,
+                        call_with_retry_async, COALESCE_QUESTIONS)
+from metrics import span, timed, count, observe, log_event, SIZE_BUCKETS
+from identity_cache import get_enrolled_course_id
+from model_router import route_question
+from prompt_budget import fit_prompt, count_tokens, count_message_tokens
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -10,82 +22,560 @@ load_dotenv()
 # Access the OpenAI API key
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-# Database connection utility
-def get_db_connection():
-    conn = psycopg2.connect(
-        host=DB_HOST,
-        dbname=DB_NAME,
-        user=DB_USER,
-        password=DB_PASS
-    )
-    return conn
+# In-process BM25 indexes per course, rebuilt whenever the course is retrained
+_course_indexes = {}
 
-DB_HOST = os.environ.get("DB_HOST")
-DB_NAME = os.environ.get("DB_NAME")
-DB_USER = os.environ.get("DB_USER")
-DB_PASS = os.environ.get("DB_PASS")
+# Function to load (or reuse) the retrieval index for a course, with the source of each chunk
+@timed("retrieval.index")
+def get_course_index(course_id, trained_at):
+    """
+    Returns:
+        tuple: (BM25Index, sources), where sources[i] is the {"document", "page", "section"} record
+            chunk i was cut from, or None for chunks indexed before sources were stored.
+    """
+    cached = _course_indexes.get(course_id)
+    if cached and cached[0] == trained_at:
+        return cached[1], cached[2]
+    query = """
+    SELECT ch.content, r.document, r.page, r.section
+    FROM Course_Chunks ch
+    LEFT JOIN Document_Records r ON ch.record_id = r.id
+    WHERE ch.course_id = %s
+    ORDER BY ch.record_id, ch.chunk_index
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (course_id,))
+            rows = cursor.fetchall()
+    index = BM25Index([row[0] for row in rows])
+    sources = [{"document": row[1], "page": row[2], "section": row[3]} if row[1] else None for row in rows]
+    _course_indexes[course_id] = (trained_at, index, sources)
+    return index, sources
+
+# Function to name a source the way students refer to it, e.g. "Lecture 4, slide 12"
+def source_label(source):
+    name = os.path.splitext(source["document"])[0]
+    if not source["page"]:
+        return name
+    return f"{name}, {'slide' if source['document'].lower().endswith('.pptx') else 'page'} {source['page']}"
+
+# Function to list the distinct sources of the excerpts sent with a question, best match first
+def cite_sources(sources):
+    citations = []
+    for source in sources:
+        if source is None:
+            continue
+        label = source_label(source)
+        if all(citation["label"] != label for citation in citations):
+            citations.append({**source, "label": label})
+    return citations
 
-# Function to load context from the database
-# Function to load context from the database
-def load_context(student_id, course_name):
+# Conversation memory settings: how many past messages to replay, their token budget,
+# and whether turns falling out of the window are folded into a rolling summary
+HISTORY_MAX_MESSAGES = int(os.environ.get("HISTORY_MAX_MESSAGES", 10))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 2000))
+HISTORY_SUMMARIZE = os.environ.get("HISTORY_SUMMARIZE", "0") == "1"
+SUMMARY_BATCH = int(os.environ.get("SUMMARY_BATCH", 10))
+SUMMARY_MODEL = os.environ.get("SUMMARY_MODEL", "gpt-4o-mini")
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", 2))
+
+# Function to load everything a question needs in one round trip: the course (looked up among
+# the student's own enrollments), its shared context, the student's rolling summary and their
+# most recent turns
+@timed("db.load_course_state")
+def load_course_state(student_id, course_name):
     query = """
-    SELECT sc.learned_context
+    SELECT c.id, c.trained_at, c.context, sc.summary, c.model, c.fast_model, c.temperature, c.max_tokens,
+           COALESCE((
+               SELECT json_agg(json_build_array(t.role, t.content) ORDER BY t.id DESC)
+               FROM (
+                   SELECT id, role, content FROM Conversation_Turns
+                   WHERE student_id = sc.student_id AND course_id = sc.course_id
+                   ORDER BY id DESC LIMIT %s
+               ) t
+           ), '[]')
     FROM Student_Courses sc
     JOIN Courses c ON sc.course_id = c.id
-    WHERE sc.student_id = %s AND c.name = %s
+    WHERE sc.student_id = %s AND sc.course_id = %s
+    """
+    # The course name is resolved from the student's cached enrollments
+    course_id = get_enrolled_course_id(student_id, course_name)
+    if course_id is None:
+        raise ValueError("Course not found for the student.")
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (HISTORY_MAX_MESSAGES, student_id, course_id))
+            row = cursor.fetchone()
+    if not row:
+        raise ValueError("Course not found for the student.")
+    course_id, trained_at, context, summary, model, fast_model, temperature, max_tokens, recent = row
+    return {
+        "id": course_id,
+        "trained_at": trained_at,
+        "context": context or "",
+        "summary": summary,
+        "recent": recent,  # newest first, as [role, content] pairs
+        "settings": {"model": model, "fast_model": fast_model, "temperature": temperature, "max_tokens": max_tokens},
+    }
+
+# Function to keep the newest messages that fit the history token budget (oldest first)
+def fit_history(recent):
+    messages = []
+    used = 0
+    for role, content in recent:
+        used += count_tokens(content)
+        if used > HISTORY_TOKEN_BUDGET:
+            break
+        messages.append({"role": role, "content": content})
+    messages.reverse()
+    return messages
+
+# Function to record one question/answer exchange
+@timed("db.save_turn")
+def save_turn(student_id, course_id, user_question, tutor_response):
+    query = """
+    INSERT INTO Conversation_Turns (student_id, course_id, role, content)
+    VALUES (%s, %s, 'user', %s), (%s, %s, 'assistant', %s)
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (student_id, course_id, user_question, student_id, course_id, tutor_response))
+            conn.commit()
+    if HISTORY_SUMMARIZE:
+        schedule_summary(student_id, course_id)
+
+# Background threads that fold old turns into summaries, so the summary's model call never holds up
+# a request; a conversation already queued or being summarized is not queued again
+_summary_executor = None
+_summary_pending = set()
+_summary_lock = threading.Lock()
+
+# Function to queue a conversation for summarize_old_turns on a background thread
+def schedule_summary(student_id, course_id):
+    global _summary_executor
+    key = (student_id, course_id)
+    with _summary_lock:
+        if key in _summary_pending:
+            return
+        _summary_pending.add(key)
+        if _summary_executor is None:
+            _summary_executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="tutor-summary")
+    _summary_executor.submit(run_summary, student_id, course_id)
+
+# Function to summarize one queued conversation; a failure only leaves the turns for the next attempt
+def run_summary(student_id, course_id):
+    try:
+        summarize_old_turns(student_id, course_id)
+    except Exception as e:
+        count("tutor_summaries_total", help="Conversation summaries", result="error")
+        log_event("summary_error", student_id=student_id, course_id=course_id, error=str(e))
+    finally:
+        with _summary_lock:
+            _summary_pending.discard((student_id, course_id))
+
+# Function to fold turns that have left the window into the student's rolling summary
+def summarize_old_turns(student_id, course_id):
+    """
+    Reads the old turns and the summary, releases the connection for the model call (which waits
+    behind the model call cap and is retried on 429s like a tutor answer), then writes the new
+    summary and deletes the folded turns in one transaction, but only if the summary is unchanged
+    and those turns are still the oldest. Otherwise another request already folded them and this
+    summary is dropped; a refused model call leaves the turns to be folded next time.
     """
     with get_db_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute(query, (student_id, course_name))
+            cursor.execute(
+                """
+                SELECT id, role, content FROM Conversation_Turns
+                WHERE student_id = %s AND course_id = %s
+                ORDER BY id DESC OFFSET %s
+                """,
+                (student_id, course_id, HISTORY_MAX_MESSAGES)
+            )
+            old_turns = cursor.fetchall()
+            if len(old_turns) < SUMMARY_BATCH:
+                return
+            old_turns.reverse()
+
+            cursor.execute(
+                "SELECT summary FROM Student_Courses WHERE student_id = %s AND course_id = %s",
+                (student_id, course_id)
+            )
             row = cursor.fetchone()
-            if row:
-                # Use numeric indexing to access the first column
-                return row[0]
-            else:
-                raise ValueError("Context not found for the student and course.")
-
-# Function to save updated context to the database
-def save_context(student_id, course_id, updated_context):
-    query = "UPDATE Student_Courses SET learned_context = %s WHERE student_id = %s AND course_id = %s"
+            previous = row[0] if row else None
+
+    transcript = "\n".join(
+        f"{'Student' if role == 'user' else 'Tutor'}: {content}" for _, role, content in old_turns
+    )
+    try:
+        with model_gate.slot():
+            response = call_with_retry(
+                get_client().chat.completions.create,
+                model=SUMMARY_MODEL,
+                messages=[
+                    {"role": "system", "content": "Summarize this tutoring conversation in a few sentences, keeping the topics the student struggled with and what has already been explained."},
+                    {"role": "user", "content": f"Earlier summary:\n{previous or ''}\n\nNew conversation:\n{transcript}"},
+                ],
+                max_tokens=200,
+                temperature=0.3,
+            )
+    except RateLimited:
+        count("tutor_summaries_total", help="Conversation summaries", result="deferred")
+        return
+    record_usage(SUMMARY_MODEL, response.usage)
+    summary = response.choices[0].message.content
+
+    turn_ids = [turn_id for turn_id, _, _ in old_turns]
     with get_db_connection() as conn:
         with conn.cursor() as cursor:
-            cursor.execute(query, (updated_context, student_id, course_id))
+            # Lock the enrollment row so concurrent summaries of the same conversation run one at a time
+            cursor.execute(
+                "SELECT summary FROM Student_Courses WHERE student_id = %s AND course_id = %s FOR UPDATE",
+                (student_id, course_id)
+            )
+            row = cursor.fetchone()
+            cursor.execute(
+                "SELECT COUNT(*) FROM Conversation_Turns WHERE student_id = %s AND course_id = %s AND id <= %s",
+                (student_id, course_id, turn_ids[-1])
+            )
+            if row is None or row[0] != previous or cursor.fetchone()[0] != len(turn_ids):
+                count("tutor_summaries_total", help="Conversation summaries", result="stale")
+                return
+
+            cursor.execute(
+                "UPDATE Student_Courses SET summary = %s WHERE student_id = %s AND course_id = %s",
+                (summary, student_id, course_id)
+            )
+            cursor.execute("DELETE FROM Conversation_Turns WHERE id = ANY(%s)", (turn_ids,))
             conn.commit()
+    count("tutor_summaries_total", help="Conversation summaries", result="saved")
+
+# Function to assemble the chat messages for a question (course context, relevant notes, recent history);
+# returns the messages and the citations for the notes that were sent
+def build_messages(course, user_question):
+    # Retrieve only the top-k course chunks relevant to this question, each labelled with its source
+    index, sources = get_course_index(course["id"], course["trained_at"])
+    ranked = index.rank(user_question, RETRIEVAL_TOP_K)
+    relevant_chunks = [
+        f"[{source_label(sources[i])}]\n{index.chunks[i]}" if sources[i] else index.chunks[i]
+        for i in ranked
+    ]
+
+    # Replay only a bounded window of the conversation, then trim everything to the prompt token budget
+    # (the instruction preamble and the question are always kept)
+    system_prompt, history, question, relevant_chunks = fit_prompt(
+        course["context"], relevant_chunks, course["summary"], fit_history(course["recent"]), user_question
+    )
+
+    messages = [
+        {"role": "system", "content": system_prompt},
+        *history,
+        {"role": "user", "content": question},
+    ]
+    prompt_tokens = count_message_tokens(messages)
+    observe("tutor_prompt_tokens", prompt_tokens, buckets=SIZE_BUCKETS, help="Tokens sent to the model per question")
+    log_event("prompt", course_id=course["id"], tokens=prompt_tokens,
+              history_messages=len(history), chunks=len(relevant_chunks))
+    # fit_prompt keeps the best matches in order, so the kept chunks are the first ones ranked
+    return messages, cite_sources([sources[i] for i in ranked[:len(relevant_chunks)]])
+
+# Function to record the token usage reported by the OpenAI API
+def record_usage(model, usage):
+    if usage is None:
+        return
+    count("tutor_model_tokens_total", usage.prompt_tokens, help="Tokens used by model calls", model=model, kind="prompt")
+    count("tutor_model_tokens_total", usage.completion_tokens, help="Tokens used by model calls", model=model, kind="completion")
+    log_event("model_usage", model=model, prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+
+_client = None
+
+# Function to get the OpenAI client used for tutor answers (429s are retried by call_with_retry, not the client)
+def get_client():
+    global _client
+    if _client is None:
+        _client = openai.OpenAI(api_key=openai.api_key, max_retries=0)
+    return _client
+
+# Function to make one chat completion call with the settings picked by model_router
+def chat_completion(messages, route):
+    with span("model.chat", model=route["model"]):
+        response = call_with_retry(
+            get_client().chat.completions.create,
+            model=route["model"],
+            messages=messages,
+            max_tokens=route["max_tokens"],
+            temperature=route["temperature"],
+        )
+    record_usage(route["model"], response.usage)
+    return response
+
+# Function to tell whether a fast-model answer should be asked again of the course's main model
+def needs_escalation(route, response):
+    if route["escalation"] and response.choices[0].finish_reason == "length":
+        count("tutor_model_escalations_total", help="Fast-model answers escalated to the main model", model=route["model"])
+        return True
+    return False
+
+# Function to tell whether the answer to a question depends only on the course and the question, so
+# it may be shared with other students: the student has no earlier turns or summary in this course
+# and the question does not refer back to the conversation
+def is_shareable(course, user_question):
+    return not course["recent"] and not course["summary"] and not refers_to_history(user_question)
+
+# Function to look up a shareable question in the course's answer cache
+def cached_answer_for(course, user_question):
+    if not ANSWER_CACHE_ENABLED or not is_shareable(course, user_question):
+        return None
+    cached_answer = answer_cache.get(course["id"], course["trained_at"], user_question)
+    count("tutor_answer_cache_total", help="Answer cache lookups", result="hit" if cached_answer is not None else "miss")
+    return cached_answer
+
+# Function to add a shareable question's answer to the course's answer cache
+def cache_answer(course, user_question, tutor_response, citations):
+    if ANSWER_CACHE_ENABLED and is_shareable(course, user_question):
+        answer_cache.put(course["id"], course["trained_at"], user_question, (tutor_response, citations))
+
+# Function to ask the model for a new answer (queued behind the model call cap, retried on 429s)
+# and add it to the answer cache; returns (answer, citations). Callers check the rate limit first.
+def answer_question(course, user_question):
+    messages, citations = build_messages(course, user_question)
+
+    # Simple questions go to the course's fast model; an answer it cannot finish is escalated
+    route = route_question(course["settings"], user_question)
+    with model_gate.slot():
+        response = chat_completion(messages, route)
+        if needs_escalation(route, response):
+            response = chat_completion(messages, route["escalation"])
+    tutor_response = response.choices[0].message.content
+    cache_answer(course, user_question, tutor_response, citations)
+    return tutor_response, citations
 
 # Function to generate GPT-4 response
 def generate_gpt_response(student_id, course_name, user_question):
+    """
+    Returns the tutor's answer and its citations, as (answer, citations). Each citation is a
+    {"document", "page", "section", "label"} dict for a course page the answer was given, e.g.
+    label "Lecture 4, slide 12". Raises RateLimited when the question is refused by the rate
+    limiter or waits too long for a model call slot.
+    """
     try:
-        # Fetch the student's context from the database
-        context = load_context(student_id, course_name)
-                
-        # Call the OpenAI API using the prompt
-        response = openai.chat.completions.create(
-            model="gpt-4o", 
-            messages=[
-                {"role": "system", "content": context},
-                {"role": "user", "content": user_question},
-            ],
-            max_tokens=500,
-            temperature=0.7,
+        course = load_course_state(student_id, course_name)
+        course_id, trained_at = course["id"], course["trained_at"]
+
+        # Serve repeated questions from the course's answer cache without an API call
+        cached_answer = cached_answer_for(course, user_question)
+        if cached_answer is not None:
+            save_turn(student_id, course_id, user_question, cached_answer[0])
+            return cached_answer
+
+        # Checked per student before any call is shared, so one student's limit never reaches another
+        rate_limiter.check(student_id, course_id)
+
+        # Students asking the same context-free question at the same time share one API call
+        key = normalize_question(user_question)
+        if COALESCE_QUESTIONS and key and is_shareable(course, user_question):
+            tutor_response, citations = coalescer.run((course_id, trained_at, key), answer_question,
+                                                      course, user_question)
+        else:
+            tutor_response, citations = answer_question(course, user_question)
+
+        # Record the new interaction as its own turn rows
+        save_turn(student_id, course_id, user_question, tutor_response)
+
+        return tutor_response, citations
+
+    except RateLimited:
+        raise
+    except Exception as e:
+        return f"An error occurred: {str(e)}", []
+
+# Async request path (asgi.py): model calls go through the async OpenAI client, and the short
+# database steps run on a thread pool sized to the connection pool, so one process can hold
+# many tutor calls in flight while only a few threads ever touch the database
+ASYNC_DB_WORKERS = int(os.environ.get("ASYNC_DB_WORKERS", DB_POOL_MAX))
+
+_async_client = None
+_db_executor = None
+
+# Function to get the shared async OpenAI client (created on first use, inside the event loop)
+def get_async_client():
+    global _async_client
+    if _async_client is None:
+        _async_client = openai.AsyncOpenAI(api_key=openai.api_key, max_retries=0)  # 429s are retried by call_with_retry_async
+    return _async_client
+
+# Function to run a blocking database helper on the database thread pool
+async def run_db(func, *args):
+    global _db_executor
+    if _db_executor is None:
+        _db_executor = ThreadPoolExecutor(max_workers=ASYNC_DB_WORKERS, thread_name_prefix="tutor-db")
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, functools.partial(func, *args))
+
+# Async version of chat_completion
+async def chat_completion_async(messages, route):
+    with span("model.chat", model=route["model"]):
+        response = await call_with_retry_async(
+            get_async_client().chat.completions.create,
+            model=route["model"],
+            messages=messages,
+            max_tokens=route["max_tokens"],
+            temperature=route["temperature"],
         )
-        tutor_response = response.choices[0].message.content
+    record_usage(route["model"], response.usage)
+    return response
+
+# Async version of answer_question
+async def answer_question_async(course, user_question):
+    messages, citations = await run_db(build_messages, course, user_question)
+
+    route = route_question(course["settings"], user_question)
+    async with model_gate.async_slot():
+        response = await chat_completion_async(messages, route)
+        if needs_escalation(route, response):
+            response = await chat_completion_async(messages, route["escalation"])
+    tutor_response = response.choices[0].message.content
+    cache_answer(course, user_question, tutor_response, citations)
+    return tutor_response, citations
 
-        # Update the context with the new interaction
-        updated_context = f"{context}\n\nStudent: {user_question}\n\nTutor: {tutor_response}"
+# Async version of generate_gpt_response; the event loop is free while the model is generating
+async def generate_gpt_response_async(student_id, course_name, user_question):
+    try:
+        course = await run_db(load_course_state, student_id, course_name)
+        course_id, trained_at = course["id"], course["trained_at"]
+
+        cached_answer = cached_answer_for(course, user_question)
+        if cached_answer is not None:
+            await run_db(save_turn, student_id, course_id, user_question, cached_answer[0])
+            return cached_answer
+
+        rate_limiter.check(student_id, course_id)
 
-        # Fetch the course ID
-        with get_db_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT id FROM Courses WHERE name = %s", (course_name,))
-                course_row = cursor.fetchone()
-                if not course_row:
-                    raise ValueError("Course ID not found.")
-                course_id = course_row[0]
+        key = normalize_question(user_question)
+        if COALESCE_QUESTIONS and key and is_shareable(course, user_question):
+            tutor_response, citations = await coalescer.run_async((course_id, trained_at, key), answer_question_async,
+                                                                  course, user_question)
+        else:
+            tutor_response, citations = await answer_question_async(course, user_question)
 
-        # Save the updated context back to the database
-        save_context(student_id, course_id, updated_context)
+        await run_db(save_turn, student_id, course_id, user_question, tutor_response)
 
-        return tutor_response
+        return tutor_response, citations
 
+    except RateLimited:
+        raise
     except Exception as e:
-        return f"An error occurred: {str(e)}"
+        return f"An error occurred: {str(e)}", []
+
+# Function to stream a GPT-4 response piece by piece; the turn is saved once the stream completes
+def generate_gpt_response_stream(student_id, course_name, user_question, citations=None):
+    """
+    Yields the tutor's answer as text deltas while the model generates it. If a `citations`
+    list is given, the answer's citations are added to it before the first delta.
+
+    Raises whatever the database or OpenAI client raises (or RateLimited), so the caller can
+    report the error to the student instead of streaming it as part of the answer.
+    """
+    course = load_course_state(student_id, course_name)
+    course_id = course["id"]
+
+    cached_answer = cached_answer_for(course, user_question)
+    if cached_answer is not None:
+        if citations is not None:
+            citations.extend(cached_answer[1])
+        yield cached_answer[0]
+        save_turn(student_id, course_id, user_question, cached_answer[0])
+        return
+
+    rate_limiter.check(student_id, course_id)
+    messages, sources = build_messages(course, user_question)
+    if citations is not None:
+        citations.extend(sources)
+
+    # Streamed answers are routed like the others, but never escalated (the student is already reading
+    # it), so a fast-model answer gets the course's full token limit rather than stopping mid-sentence
+    route = route_question(course["settings"], user_question, stream=True)
+    model = route["model"]
+
+    # The model call slot is held until the stream finishes (or the student disconnects)
+    with model_gate.slot():
+        started = time.perf_counter()
+        stream = call_with_retry(
+            get_client().chat.completions.create,
+            model=model,
+            messages=messages,
+            max_tokens=route["max_tokens"],
+            temperature=route["temperature"],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        for chunk in stream:
+            if chunk.usage is not None:
+                record_usage(model, chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    observe("tutor_time_to_first_token_seconds", time.perf_counter() - started, help="Time until the first streamed token", model=model)
+                parts.append(delta)
+                yield delta
+        observe("tutor_span_seconds", time.perf_counter() - started, span="model.chat_stream", status="ok", model=model)
+
+    tutor_response = "".join(parts)
+    cache_answer(course, user_question, tutor_response, sources)
+
+    # Record the new interaction as its own turn rows
+    save_turn(student_id, course_id, user_question, tutor_response)
+
+# Async version of generate_gpt_response_stream, used by the native SSE handler in asgi.py
+async def generate_gpt_response_stream_async(student_id, course_name, user_question, citations=None):
+    course = await run_db(load_course_state, student_id, course_name)
+    course_id = course["id"]
+
+    cached_answer = cached_answer_for(course, user_question)
+    if cached_answer is not None:
+        if citations is not None:
+            citations.extend(cached_answer[1])
+        yield cached_answer[0]
+        await run_db(save_turn, student_id, course_id, user_question, cached_answer[0])
+        return
+
+    rate_limiter.check(student_id, course_id)
+    messages, sources = await run_db(build_messages, course, user_question)
+    if citations is not None:
+        citations.extend(sources)
+
+    route = route_question(course["settings"], user_question, stream=True)
+    model = route["model"]
+
+    # The model call slot is held until the stream finishes (or the student disconnects)
+    async with model_gate.async_slot():
+        started = time.perf_counter()
+        stream = await call_with_retry_async(
+            get_async_client().chat.completions.create,
+            model=model,
+            messages=messages,
+            max_tokens=route["max_tokens"],
+            temperature=route["temperature"],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        parts = []
+        async for chunk in stream:
+            if chunk.usage is not None:
+                record_usage(model, chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if not parts:
+                    observe("tutor_time_to_first_token_seconds", time.perf_counter() - started, help="Time until the first streamed token", model=model)
+                parts.append(delta)
+                yield delta
+        observe("tutor_span_seconds", time.perf_counter() - started, span="model.chat_stream", status="ok", model=model)
+
+    tutor_response = "".join(parts)
+    cache_answer(course, user_question, tutor_response, sources)
+
+    await run_db(save_turn, student_id, course_id, user_question, tutor_response)
@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import traceback
+
+# Allow imports of the shared modules in the project root when run as `python train/worker.py`
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db import get_db_connection, close_pool
+from read_docs import train_course
+
+POLL_INTERVAL = float(os.environ.get("TRAIN_POLL_INTERVAL", 5))
+STALE_SECONDS = int(os.environ.get("TRAIN_STALE_SECONDS", 1800))  # running jobs with no progress for this long are retried
+
+# Function to claim the oldest queued (or abandoned) job; SKIP LOCKED lets several workers share the queue
+def claim_next_job():
+    query = """
+    UPDATE Training_Jobs
+    SET status = 'running', started_at = NOW(), updated_at = NOW()
+    WHERE id = (
+        SELECT id FROM Training_Jobs
+        WHERE status = 'queued'
+           OR (status = 'running' AND updated_at < NOW() - INTERVAL '1 second' * %s)
+        ORDER BY id
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, username, course_name, proctor_id
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (STALE_SECONDS,))
+            return cursor.fetchone()
+
+# Function to record per-document progress for a job
+def report_progress(job_id, done, total, filename):
+    query = """
+    UPDATE Training_Jobs
+    SET processed_docs = %s, total_docs = %s, current_document = %s, updated_at = NOW()
+    WHERE id = %s
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (done, total, filename, job_id))
+
+# Function to mark a job as finished
+def finish_job(job_id, status, message):
+    query = """
+    UPDATE Training_Jobs
+    SET status = %s, message = %s, current_document = NULL, finished_at = NOW(), updated_at = NOW()
+    WHERE id = %s
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (status, message, job_id))
+
+# Function to run one claimed job to completion
+def run_job(job):
+    job_id, username, course_name, proctor_id = job
+    print(f"Starting training job {job_id} for course {course_name}")
+    try:
+        train_course(
+            username, course_name, proctor_id,
+            progress=lambda done, total, filename: report_progress(job_id, done, total, filename)
+        )
+        finish_job(job_id, "succeeded", f"Training completed successfully for course {course_name}!")
+    except Exception as e:
+        traceback.print_exc()
+        finish_job(job_id, "failed", f"Training error: {str(e)}")
+
+# Main function: with --drain, exit once the queue is empty; otherwise poll forever
+def main():
+    drain = "--drain" in sys.argv[1:]
+    try:
+        while True:
+            job = claim_next_job()
+            if job:
+                run_job(job)
+            elif drain:
+                break
+            else:
+                time.sleep(POLL_INTERVAL)
+    finally:
+        close_pool()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import os
+import secrets
+
+from db import get_db_connection
+
+# Resumable upload sessions older than this many hours are dropped (GCS expires its session URLs after a week)
+UPLOAD_SESSION_MAX_AGE_HOURS = int(os.environ.get("UPLOAD_SESSION_MAX_AGE_HOURS", 24))
+
+# Function to save a new upload session for a proctor and return its ID (the only part the browser sees)
+def create_upload_session(proctor_id, folder_prefix, blob_name, size, token):
+    upload_id = secrets.token_urlsafe(12)
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM Upload_Sessions WHERE created_at < NOW() - make_interval(hours => %s)",
+                (UPLOAD_SESSION_MAX_AGE_HOURS,)
+            )
+            cursor.execute(
+                """
+                INSERT INTO Upload_Sessions (id, proctor_id, folder_prefix, blob_name, size, token)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                """,
+                (upload_id, proctor_id, folder_prefix, blob_name, size, token)
+            )
+    return upload_id
+
+# Function to fetch an upload session owned by the given proctor, or None
+def get_upload_session(upload_id, proctor_id):
+    query = """
+    SELECT folder_prefix, blob_name, size, token
+    FROM Upload_Sessions
+    WHERE id = %s AND proctor_id = %s AND created_at >= NOW() - make_interval(hours => %s)
+    """
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(query, (upload_id, proctor_id, UPLOAD_SESSION_MAX_AGE_HOURS))
+            row = cursor.fetchone()
+    if not row:
+        return None
+    return {"folder_prefix": row[0], "blob_name": row[1], "size": row[2], "token": row[3]}
+
+# Function to drop an upload session once its file is stored
+def delete_upload_session(upload_id):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM Upload_Sessions WHERE id = %s", (upload_id,))